@@ -53,12 +53,8 @@ print(__doc__)
 
 FACE_DIM = (50,50) # h = 50, w = 50
 
-# Load training data from face_profiles/
-face_profile_data, face_profile_name_index, face_profile_names  = ut.load_training_data("../face_profiles/")
-
-
-# Build the classifier
-clf, pca = svm.build_SVC(face_profile_data, face_profile_name_index, FACE_DIM)
+# Load the classifier trained on face_profiles/, training it first if the profiles changed
+clf, pca, face_profile_names = svm.load_or_build_SVC("../face_profiles/", FACE_DIM)
 
 
 ###############################################################################
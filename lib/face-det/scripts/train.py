@@ -28,6 +28,8 @@ Usage during run time:
 
         press 'q' or 'ESC' to quit the application
 
+        on quitting, the new profile is added to the saved face model in ../face_profiles/ without retraining on the other profiles
+
         
 Auther: Chenxing Ouyang <c2ouyang@ucsd.edu>
 
@@ -40,6 +42,7 @@ import sys
 import os
 
 import utils as ut
+import svm
 
 
 FACE_DIM = (200, 200)
@@ -184,3 +187,8 @@ while ret:
 
 webcam.release()
 cv2.destroyAllWindows()
+
+# Add the new profile to the saved face model, so main.py recognizes it
+# without retraining on every profile
+if num_of_face_saved:
+    svm.enroll("../face_profiles/", sys.argv[1])
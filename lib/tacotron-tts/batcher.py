@@ -0,0 +1,133 @@
+import queue
+import time
+from threading import Event, Thread
+
+
+class SynthesisBatcher:
+  '''Serves concurrent synthesis requests from one Synthesizer by micro-batching them.
+
+  Request threads call synthesize(), which enqueues the text and waits. A single worker thread
+  takes the first pending request, keeps collecting requests for up to max_wait_ms (or until
+  max_batch_size is reached), and runs them through Synthesizer.synthesize_batch in one decoder
+  pass. Requests with the same vocoder setting share a pass whatever their length: the model
+  masks the padding, so each one's audio is the same as when it is synthesized on its own,
+  which is also what lets the audio cache hold it. Within a pass the texts are sorted by input
+  length, and a text more than max_padding times as long as the shortest one starts another
+  pass, so short requests aren't padded out to much longer ones.
+
+  The queue is bounded: once max_pending requests are waiting, synthesize() raises queue.Full
+  so the server can shed load instead of queueing without limit.
+
+  Args:
+    synthesizer: a loaded Synthesizer (anything with a synthesize_batch(texts, iters) method)
+    max_batch_size: most requests to decode together
+    max_wait_ms: how long to hold the first request of a batch while waiting for company
+    max_pending: most requests allowed to wait in the queue
+    max_padding: longest input a pass may hold, as a multiple of its shortest input
+  '''
+  def __init__(self, synthesizer, max_batch_size=8, max_wait_ms=20, max_pending=64, max_padding=2.0):
+    self._synthesizer = synthesizer
+    self._max_padding = max_padding
+    self._max_batch_size = max_batch_size
+    self._max_wait = max_wait_ms / 1000.0
+    self._queue = queue.Queue(max_pending)
+    self._thread = None
+
+
+  def start(self):
+    if self._thread is None:
+      self._thread = Thread(target=self._run, name='synthesis-batcher', daemon=True)
+      self._thread.start()
+    return self
+
+
+  def synthesize(self, text, griffin_lim_iters=None):
+    '''Synthesizes text, blocking until its batch has run.
+
+    Returns:
+      A SynthesisRequest with the WAV bytes in .wav and timing in .latency / .batch_size
+
+    Raises:
+      queue.Full if too many requests are already pending.
+    '''
+    request = SynthesisRequest(text, griffin_lim_iters)
+    self._queue.put_nowait(request)
+    request.done.wait()
+    if request.error is not None:
+      raise request.error
+    return request
+
+
+  def _run(self):
+    while True:
+      batch = [self._queue.get()]
+      deadline = time.time() + self._max_wait
+      while len(batch) < self._max_batch_size:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          break
+        try:
+          batch.append(self._queue.get(timeout=remaining))
+        except queue.Empty:
+          break
+      # Requests asking for a different vocoder quality don't share a decoder pass:
+      groups = {}
+      for request in batch:
+        groups.setdefault(request.griffin_lim_iters, []).append(request)
+      for iters, requests in groups.items():
+        for bucket in self._buckets(requests):
+          self._synthesize_group(bucket, iters)
+
+
+  def _buckets(self, requests):
+    # Splits requests, sorted by input length, into passes that each pad to at most
+    # max_padding times their shortest input. A text that can't be encoded goes alone, so its
+    # error doesn't fail the others.
+    lengths = [(self._input_length(r.text), i) for i, r in enumerate(requests)]
+    buckets = [[requests[i]] for length, i in lengths if length is None]
+    bucket, shortest = [], None
+    for length, i in sorted(l for l in lengths if l[0] is not None):
+      if bucket and length > max(shortest, 1) * self._max_padding:
+        buckets.append(bucket)
+        bucket = []
+      if not bucket:
+        shortest = length
+      bucket.append(requests[i])
+    if bucket:
+      buckets.append(bucket)
+    return buckets
+
+
+  def _input_length(self, text):
+    input_length = getattr(self._synthesizer, 'input_length', None)
+    try:
+      return input_length(text) if input_length else len(text)
+    except Exception:
+      return None  # synthesize_batch will raise the same error for this request
+
+
+  def _synthesize_group(self, requests, griffin_lim_iters):
+    try:
+      wavs = self._synthesizer.synthesize_batch([r.text for r in requests], griffin_lim_iters)
+    except Exception as e:
+      wavs = [None] * len(requests)
+      for request in requests:
+        request.error = e
+    finished = time.time()
+    for request, wav in zip(requests, wavs):
+      request.wav = wav
+      request.batch_size = len(requests)
+      request.latency = finished - request.enqueued
+      request.done.set()
+
+
+class SynthesisRequest:
+  def __init__(self, text, griffin_lim_iters):
+    self.text = text
+    self.griffin_lim_iters = griffin_lim_iters
+    self.enqueued = time.time()
+    self.done = Event()
+    self.wav = None
+    self.error = None
+    self.batch_size = 0
+    self.latency = 0.0
@@ -1,8 +1,13 @@
 import argparse
 import falcon
+from batcher import SynthesisBatcher
 from hparams import hparams, hparams_debug_string
 import os
+import queue
+import socketserver
 from synthesizer import Synthesizer
+from util.infolog import log
+from wsgiref import simple_server
 
 
 html_body = '''<html><title>Demo</title>
@@ -67,29 +72,54 @@ class SynthesisResource:
   def on_get(self, req, res):
     if not req.params.get('text'):
       raise falcon.HTTPBadRequest()
-    res.data = synthesizer.synthesize(req.params.get('text'))
+    iters = req.get_param_as_int('iters')  # Quality/latency knob for the fast vocoder
+    try:
+      request = batcher.synthesize(req.params.get('text'), iters)
+    except queue.Full:
+      raise falcon.HTTPServiceUnavailable('Busy', 'Too many pending synthesis requests', 1)
+    log('Synthesized %d chars in %.0f ms (batch of %d)' % (
+      len(request.text), request.latency * 1000, request.batch_size))
+    res.set_header('X-Synthesis-Latency-Ms', '%.0f' % (request.latency * 1000))
+    res.set_header('X-Synthesis-Batch-Size', str(request.batch_size))
+    res.data = request.wav
     res.content_type = 'audio/wav'
 
 
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, simple_server.WSGIServer):
+  '''Handles each connection on its own thread, so requests can be batched together.'''
+  daemon_threads = True
+
+
 synthesizer = Synthesizer()
+batcher = SynthesisBatcher(synthesizer)
 api = falcon.API()
 api.add_route('/synthesize', SynthesisResource())
 api.add_route('/', UIResource())
 
 
 if __name__ == '__main__':
-  from wsgiref import simple_server
   parser = argparse.ArgumentParser()
   parser.add_argument('--checkpoint', required=True, help='Full path to model checkpoint')
   parser.add_argument('--port', type=int, default=9000)
+  parser.add_argument('--max_batch_size', type=int, default=8,
+    help='Most pending requests to synthesize in one decoder pass')
+  parser.add_argument('--max_wait_ms', type=float, default=20,
+    help='How long to wait for more requests before running a batch')
+  parser.add_argument('--max_pending', type=int, default=64,
+    help='Requests allowed to wait for synthesis before the server answers 503')
+  parser.add_argument('--vocoder', default='tensorflow', choices=['tensorflow', 'fast'],
+    help='Griffin-Lim implementation; "fast" trades a little quality for speed')
   parser.add_argument('--hparams', default='',
     help='Hyperparameter overrides as a comma-separated list of name=value pairs')
   args = parser.parse_args()
   os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
   hparams.parse(args.hparams)
   print(hparams_debug_string())
-  synthesizer.load(args.checkpoint)
+  synthesizer.load(args.checkpoint, vocoder=args.vocoder)
+  batcher = SynthesisBatcher(synthesizer, args.max_batch_size, args.max_wait_ms, args.max_pending)
+  batcher.start()
   print('Serving on port %d' % args.port)
-  simple_server.make_server('0.0.0.0', args.port, api).serve_forever()
+  simple_server.make_server('0.0.0.0', args.port, api, ThreadingWSGIServer).serve_forever()
 else:
-  synthesizer.load(os.environ['CHECKPOINT'])
+  synthesizer.load(os.environ['CHECKPOINT'], vocoder=os.environ.get('VOCODER', 'tensorflow'))
+  batcher.start()
@@ -0,0 +1,80 @@
+import queue
+import time
+from threading import Event, Thread
+from hparams import hparams
+from streaming import StreamingSpeaker
+from synthesizer import Synthesizer
+from util.cache import AudioCache
+from util.infolog import log
+
+
+class SpeechEngine:
+  '''Long-lived text-to-speech engine.
+
+  The Tacotron graph is built and the checkpoint restored once, in start(). Utterances are
+  then pushed onto an in-memory queue and spoken by a single worker thread, so each reply
+  costs one session.run per sentence instead of a fresh Python + TensorFlow process. Long
+  replies are streamed: the first sentence plays while the rest are still synthesizing.
+
+  Interactive replies default to the fast vocoder (see Synthesizer.load), trading a little
+  quality for a much cheaper Griffin-Lim step. Synthesized sentences go through an AudioCache,
+  so stock phrases ("We are connected") are only ever synthesized once; pass cache_dir to keep
+  them across restarts.
+  '''
+  def __init__(self, checkpoint_path, sink=None, max_pending=32, vocoder='fast', cache_dir=None):
+    self._checkpoint_path = checkpoint_path
+    self._vocoder = vocoder
+    self._queue = queue.Queue(max_pending)
+    self._thread = None
+    self.synthesizer = Synthesizer(cache=AudioCache(cache_dir, hparams.sample_rate))
+    self.speaker = StreamingSpeaker(self.synthesizer, sink)
+
+
+  def start(self):
+    '''Loads the model and starts the worker thread. Safe to call more than once.'''
+    if self._thread is None:
+      self.synthesizer.load(self._checkpoint_path, vocoder=self._vocoder)
+      self._thread = Thread(target=self._run, name='speech-engine', daemon=True)
+      self._thread.start()
+    return self
+
+
+  def say(self, text, block=False):
+    '''Queues text to be spoken.
+
+    Args:
+      text: the utterance to speak
+      block: if True, wait until the utterance has finished playing
+
+    Returns:
+      threading.Event that is set once the utterance has been spoken (or has failed)
+    '''
+    done = Event()
+    self._queue.put((text, done))
+    if block:
+      done.wait()
+    return done
+
+
+  def stop(self):
+    '''Finishes the utterances already queued, then stops the worker thread.'''
+    if self._thread is not None:
+      self._queue.put(None)
+      self._thread.join()
+      self._thread = None
+
+
+  def _run(self):
+    while True:
+      item = self._queue.get()
+      if item is None:
+        break
+      text, done = item
+      try:
+        start = time.time()
+        self.speaker.speak(text)
+        log('Spoke %d chars in %.3f sec' % (len(text), time.time() - start))
+      except Exception as e:
+        log('Failed to speak "%s": %s' % (text, e))
+      finally:
+        done.set()
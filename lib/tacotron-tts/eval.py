@@ -20,18 +20,21 @@ def get_output_base_path(checkpoint_path):
 def run_eval(args):
   print(hparams_debug_string())
   synth = Synthesizer()
-  synth.load(args.checkpoint)
+  synth.load(args.checkpoint, vocoder=args.vocoder)
   base_path = get_output_base_path(args.checkpoint)
-  for i, text in enumerate(sentences):
+  print('Synthesizing %d sentences' % len(sentences))
+  for i, wav in enumerate(synth.synthesize_batch(sentences)):
     path = '%s-%d.wav' % (base_path, i)
-    print('Synthesizing: %s' % path)
+    print('Writing: %s' % path)
     with open(path, 'wb') as f:
-      f.write(synth.synthesize(text))
+      f.write(wav)
 
 
 def main():
   parser = argparse.ArgumentParser()
   parser.add_argument('--checkpoint', required=True, help='Path to model checkpoint')
+  parser.add_argument('--vocoder', default='tensorflow', choices=['tensorflow', 'fast'],
+    help='Griffin-Lim implementation; "fast" trades a little quality for speed')
   parser.add_argument('--hparams', default='',
     help='Hyperparameter overrides as a comma-separated list of name=value pairs')
   args = parser.parse_args()
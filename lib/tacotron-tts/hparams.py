@@ -32,6 +32,8 @@ hparams = tf.contrib.training.HParams(
   # Eval:
   max_iters=200,
   griffin_lim_iters=60,
+  fast_griffin_lim_iters=16,   # Default iterations when using the fast vocoder (util/vocoder.py)
+  griffin_lim_momentum=0.99,   # Momentum for the fast vocoder; 0 is plain Griffin-Lim
   power=1.5,              # Power to raise magnitudes to prior to Griffin-Lim
 )
 
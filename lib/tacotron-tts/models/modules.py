@@ -34,6 +34,14 @@ def post_cbhg(inputs, input_dim, is_training):
 
 def cbhg(inputs, input_lengths, is_training, scope, K, projections):
   with tf.variable_scope(scope):
+    # Zero the padding of shorter sequences in a batch before every convolution, so each one
+    # sees the same zeros past its end as when it is run on its own:
+    if input_lengths is not None:
+      mask = tf.expand_dims(tf.sequence_mask(input_lengths, tf.shape(inputs)[1], tf.float32), -1)
+    else:
+      mask = None
+    inputs = _mask_padding(inputs, mask)
+
     with tf.variable_scope('conv_bank'):
       # Convolution bank: concatenate on the last axis to stack channels from all convolutions
       conv_outputs = tf.concat(
@@ -41,15 +49,19 @@ def cbhg(inputs, input_lengths, is_training, scope, K, projections):
         axis=-1
       )
 
-    # Maxpooling:
+    # Maxpooling (padding is pushed to the float minimum so it never wins, like 'same' padding):
+    if mask is not None:
+      conv_outputs = conv_outputs * mask + (1.0 - mask) * conv_outputs.dtype.min
     maxpool_output = tf.layers.max_pooling1d(
       conv_outputs,
       pool_size=2,
       strides=1,
       padding='same')
+    maxpool_output = _mask_padding(maxpool_output, mask)
 
     # Two projection layers:
     proj1_output = conv1d(maxpool_output, 3, projections[0], tf.nn.relu, is_training, 'proj_1')
+    proj1_output = _mask_padding(proj1_output, mask)
     proj2_output = conv1d(proj1_output, 3, projections[1], None, is_training, 'proj_2')
 
     # Residual connection:
@@ -74,6 +86,10 @@ def cbhg(inputs, input_lengths, is_training, scope, K, projections):
     return tf.concat(outputs, axis=2)  # Concat forward and backward
 
 
+def _mask_padding(inputs, mask):
+  return inputs if mask is None else inputs * mask
+
+
 def highwaynet(inputs, scope):
   with tf.variable_scope(scope):
     H = tf.layers.dense(
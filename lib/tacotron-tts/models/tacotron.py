@@ -46,10 +46,10 @@ class Tacotron():
       prenet_outputs = prenet(embedded_inputs, is_training)                       # [N, T_in, 128]
       encoder_outputs = encoder_cbhg(prenet_outputs, input_lengths, is_training)  # [N, T_in, 256]
 
-      # Attention
+      # Attention (masked to each sequence's own length, so padding in a batch gets no weight)
       attention_cell = AttentionWrapper(
         DecoderPrenetWrapper(GRUCell(256), is_training),
-        BahdanauAttention(256, encoder_outputs),
+        BahdanauAttention(256, encoder_outputs, memory_sequence_length=input_lengths),
         alignment_history=True,
         output_attention=False)                                                  # [N, T_in, 256]
 
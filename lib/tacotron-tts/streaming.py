@@ -0,0 +1,155 @@
+import re
+import numpy as np
+from threading import Condition, Thread
+
+
+# Sentence boundaries: terminal punctuation followed by whitespace.
+_sentence_end_re = re.compile(r'(?<=[.!?])\s+')
+
+# Abbreviations that end in a period but don't end a sentence (see text/cleaners.py):
+_abbreviations = set([
+  'mrs', 'mr', 'dr', 'st', 'co', 'jr', 'maj', 'gen', 'drs', 'rev', 'lt', 'hon', 'sgt', 'capt',
+  'esq', 'ltd', 'col', 'ft'])
+
+
+def split_sentences(text):
+  '''Splits text into sentences, so each one can be synthesized and played as soon as it's ready.'''
+  sentences = []
+  for piece in _sentence_end_re.split(text.strip()):
+    if not piece:
+      continue
+    if sentences and _ends_with_abbreviation(sentences[-1]):
+      sentences[-1] += ' ' + piece
+    else:
+      sentences.append(piece)
+  return sentences
+
+
+def _ends_with_abbreviation(sentence):
+  words = sentence.split()
+  return sentence.endswith('.') and words[-1][:-1].lower() in _abbreviations
+
+
+class AudioRingBuffer:
+  '''Fixed-capacity, thread-safe FIFO of int16 samples.
+
+  write() blocks while the buffer is full and read() blocks while it is empty, so a fast
+  producer can't run arbitrarily far ahead of playback.
+  '''
+  def __init__(self, capacity):
+    self._buffer = np.zeros(capacity, dtype=np.int16)
+    self._capacity = capacity
+    self._start = 0
+    self._size = 0
+    self._closed = False
+    self._cond = Condition()
+
+
+  def __len__(self):
+    with self._cond:
+      return self._size
+
+
+  def write(self, samples):
+    samples = np.asarray(samples, dtype=np.int16)
+    offset = 0
+    with self._cond:
+      while offset < len(samples):
+        while self._size == self._capacity and not self._closed:
+          self._cond.wait()
+        if self._closed:
+          raise ValueError('Write to a closed AudioRingBuffer')
+        n = min(len(samples) - offset, self._capacity - self._size)
+        end = (self._start + self._size) % self._capacity
+        first = min(n, self._capacity - end)
+        self._buffer[end:end + first] = samples[offset:offset + first]
+        self._buffer[:n - first] = samples[offset + first:offset + n]
+        self._size += n
+        offset += n
+        self._cond.notify_all()
+
+
+  def read(self, max_samples):
+    '''Returns up to max_samples samples. Returns an empty array once closed and drained.'''
+    with self._cond:
+      while self._size == 0 and not self._closed:
+        self._cond.wait()
+      n = min(max_samples, self._size)
+      first = min(n, self._capacity - self._start)
+      out = np.concatenate([
+        self._buffer[self._start:self._start + first],
+        self._buffer[:n - first]])
+      self._start = (self._start + n) % self._capacity
+      self._size -= n
+      self._cond.notify_all()
+      return out
+
+
+  def close(self):
+    '''Marks the end of the stream. Readers drain what's left, then get an empty array.'''
+    with self._cond:
+      self._closed = True
+      self._cond.notify_all()
+
+
+class StreamingSpeaker:
+  '''Speaks text sentence by sentence, playing each sentence while the next one synthesizes.
+
+  The calling thread synthesizes sentences and writes their samples into an AudioRingBuffer;
+  a playback thread drains the buffer into the sink. Time-to-first-audio is the synthesis time
+  of the first sentence rather than of the whole text.
+
+  Args:
+    synthesizer: a loaded Synthesizer (anything with a synthesize_pcm(text) method)
+    sink: callable taking an int16 numpy array of samples and playing it. Defaults to PyAudioSink.
+    sample_rate: sample rate of the synthesized audio. Defaults to hparams.sample_rate.
+    buffer_sec: capacity of the ring buffer, in seconds of audio
+    chunk_sec: how much audio the playback thread hands to the sink at a time
+  '''
+  def __init__(self, synthesizer, sink=None, sample_rate=None, buffer_sec=30, chunk_sec=0.1):
+    if sample_rate is None:
+      from hparams import hparams
+      sample_rate = hparams.sample_rate
+    self._synthesizer = synthesizer
+    self._sink = sink or PyAudioSink(sample_rate)
+    self._capacity = int(buffer_sec * sample_rate)
+    self._chunk_size = int(chunk_sec * sample_rate)
+
+
+  def speak(self, text):
+    '''Synthesizes and plays text. Returns once the last sentence has been played.'''
+    ring = AudioRingBuffer(self._capacity)
+    player = Thread(target=self._play, args=(ring,), name='tts-playback', daemon=True)
+    player.start()
+    try:
+      for sentence in split_sentences(text):
+        ring.write(self._synthesizer.synthesize_pcm(sentence))
+    finally:
+      ring.close()
+      player.join()
+
+
+  def _play(self, ring):
+    try:
+      while True:
+        chunk = ring.read(self._chunk_size)
+        if not len(chunk):
+          break
+        self._sink(chunk)
+    finally:
+      ring.close()  # Unblocks the producer if the sink fails
+
+
+class PyAudioSink:
+  '''Plays int16 mono samples through a PyAudio output stream that stays open between calls.'''
+  def __init__(self, sample_rate):
+    self._sample_rate = sample_rate
+    self._stream = None
+
+
+  def __call__(self, samples):
+    if self._stream is None:
+      import pyaudio
+      self._stream = pyaudio.PyAudio().open(
+        format=pyaudio.paInt16, channels=1, rate=self._sample_rate, output=True)
+    self._stream.write(samples.tobytes())
@@ -1,4 +1,5 @@
 import io
+import os
 import numpy as np
 import tensorflow as tf
 from hparams import hparams
@@ -9,14 +10,39 @@ from util import audio
 
 
 class Synthesizer:
-  def load(self, checkpoint_path, model_name='tacotron'):
+  def __init__(self, cache=None):
+    '''
+    Args:
+      cache: optional util.cache.AudioCache; repeated utterances are then served from it
+        instead of being synthesized again.
+    '''
+    self.cache = cache
+
+
+  def load(self, checkpoint_path, model_name='tacotron', vocoder='tensorflow'):
+    '''Builds the model and restores the checkpoint.
+
+    Args:
+      checkpoint_path: path to the model checkpoint
+      model_name: name of the model to construct (see models/__init__.py)
+      vocoder: "tensorflow" runs hparams.griffin_lim_iters Griffin-Lim iterations inside the
+        graph. "fast" runs the momentum Griffin-Lim from util/vocoder.py on the CPU, which
+        converges in far fewer iterations and lets each request choose its own iteration count.
+    '''
+    if vocoder not in ('tensorflow', 'fast'):
+      raise Exception('Unknown vocoder: ' + vocoder)
     print('Constructing model: %s' % model_name)
-    inputs = tf.placeholder(tf.int32, [1, None], 'inputs')
-    input_lengths = tf.placeholder(tf.int32, [1], 'input_lengths')
+    inputs = tf.placeholder(tf.int32, [None, None], 'inputs')
+    input_lengths = tf.placeholder(tf.int32, [None], 'input_lengths')
     with tf.variable_scope('model') as scope:
       self.model = create_model(model_name, hparams)
       self.model.initialize(inputs, input_lengths)
-      self.wav_output = audio.inv_spectrogram_tensorflow(self.model.linear_outputs[0])
+      if vocoder == 'tensorflow':
+        self.wav_output = audio.inv_spectrogram_tensorflow_batch(self.model.linear_outputs)
+    self.vocoder = vocoder
+    # Everything besides the input text that changes the audio goes into the cache key:
+    self._cache_salt = '%s|%s|%s|%r' % (
+      os.path.abspath(checkpoint_path), model_name, vocoder, sorted(hparams.values().items()))
 
     print('Loading checkpoint: %s' % checkpoint_path)
     self.session = tf.Session()
@@ -25,16 +51,81 @@ class Synthesizer:
     saver.restore(self.session, checkpoint_path)
 
 
-  def synthesize(self, text):
+  def synthesize(self, text, griffin_lim_iters=None):
+    return self.synthesize_batch([text], griffin_lim_iters)[0]
+
+
+  def synthesize_batch(self, texts, griffin_lim_iters=None):
+    '''Synthesizes several utterances with one decoder pass and one Griffin-Lim pass.
+
+    Args:
+      texts: list of strings to synthesize
+      griffin_lim_iters: iterations for the fast vocoder; fewer is faster but lower quality.
+        Defaults to hparams.fast_griffin_lim_iters. Ignored by the tensorflow vocoder.
+
+    Returns:
+      List of WAV-encoded bytes, one per entry in texts
+    '''
+    results = []
+    for pcm in self.synthesize_pcm_batch(texts, griffin_lim_iters):
+      out = io.BytesIO()
+      audio.save_pcm16(pcm, out)
+      results.append(out.getvalue())
+    return results
+
+
+  def synthesize_pcm(self, text, griffin_lim_iters=None):
+    '''Synthesizes one utterance to an int16 numpy array of samples at hparams.sample_rate.'''
+    return self.synthesize_pcm_batch([text], griffin_lim_iters)[0]
+
+
+  def synthesize_pcm_batch(self, texts, griffin_lim_iters=None):
+    '''Like synthesize_batch, but returns raw int16 PCM arrays instead of WAV bytes.'''
+    cleaner_names = [x.strip() for x in hparams.cleaners.split(',')]
+    seqs = [text_to_sequence(text, cleaner_names) for text in texts]
+    if self.cache is None:
+      return self._synthesize_sequences(seqs, griffin_lim_iters)
+
+    iters = ''
+    if self.vocoder == 'fast':
+      iters = griffin_lim_iters if griffin_lim_iters is not None else hparams.fast_griffin_lim_iters
+    salt = '%s|%s' % (self._cache_salt, iters)
+    keys = [self.cache.key(seq, salt) for seq in seqs]
+    results = [self.cache.get(key) for key in keys]
+    misses = [i for i, pcm in enumerate(results) if pcm is None]
+    pcms = self._synthesize_sequences([seqs[i] for i in misses], griffin_lim_iters)
+    for i, pcm in zip(misses, pcms):
+      self.cache.put(keys[i], pcm)
+      results[i] = pcm
+    return results
+
+
+  def input_length(self, text):
+    '''Number of encoder steps text takes; SynthesisBatcher groups texts of similar length.'''
     cleaner_names = [x.strip() for x in hparams.cleaners.split(',')]
-    seq = text_to_sequence(text, cleaner_names)
+    return len(text_to_sequence(text, cleaner_names))
+
+
+  def _synthesize_sequences(self, seqs, griffin_lim_iters):
+    if not seqs:
+      return []
+    input_lengths = np.asarray([len(seq) for seq in seqs], dtype=np.int32)
+    inputs = np.zeros([len(seqs), np.max(input_lengths)], dtype=np.int32)  # Padded with '_' (id 0)
+    for i, seq in enumerate(seqs):
+      inputs[i, :len(seq)] = seq
     feed_dict = {
-      self.model.inputs: [np.asarray(seq, dtype=np.int32)],
-      self.model.input_lengths: np.asarray([len(seq)], dtype=np.int32)
+      self.model.inputs: inputs,
+      self.model.input_lengths: input_lengths
     }
-    wav = self.session.run(self.wav_output, feed_dict=feed_dict)
-    wav = audio.inv_preemphasis(wav)
-    wav = wav[:audio.find_endpoint(wav)]
-    out = io.BytesIO()
-    audio.save_wav(wav, out)
-    return out.getvalue()
+    if self.vocoder == 'fast':
+      linears = self.session.run(self.model.linear_outputs, feed_dict=feed_dict)
+      wavs = [audio.inv_spectrogram_fast(linear.T, griffin_lim_iters) for linear in linears]
+    else:
+      wavs = self.session.run(self.wav_output, feed_dict=feed_dict)
+      wavs = [audio.inv_preemphasis(wav) for wav in wavs]
+    results = []
+    for wav in wavs:
+      # Every wav is padded to the longest utterance, so trim each at its own endpoint:
+      wav = wav[:audio.find_endpoint(wav)]
+      results.append(audio.to_pcm16(wav))
+    return results
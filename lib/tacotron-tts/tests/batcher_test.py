@@ -0,0 +1,119 @@
+import numpy as np
+import queue
+import pytest
+import time
+from threading import Event, Thread
+from batcher import SynthesisBatcher
+
+
+class _FakeSynthesizer:
+  def __init__(self):
+    self.batches = []
+    self.release = Event()
+    self.release.set()
+
+  def synthesize_batch(self, texts, griffin_lim_iters=None):
+    self.release.wait()
+    self.batches.append((list(texts), griffin_lim_iters))
+    return [text.upper().encode() for text in texts]
+
+
+def _run_concurrently(batcher, texts, iters=None):
+  results = {}
+  def request(text, iters):
+    results[text] = batcher.synthesize(text, iters)
+  threads = [Thread(target=request, args=(text, iters and iters[i])) for i, text in enumerate(texts)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return results
+
+
+def test_concurrent_requests_share_a_batch():
+  synth = _FakeSynthesizer()
+  batcher = SynthesisBatcher(synth, max_batch_size=8, max_wait_ms=200).start()
+  results = _run_concurrently(batcher, ['a', 'b', 'c'])
+  assert {text: r.wav for text, r in results.items()} == {'a': b'A', 'b': b'B', 'c': b'C'}
+  assert len(synth.batches) == 1
+  assert sorted(synth.batches[0][0]) == ['a', 'b', 'c']
+  assert all(r.batch_size == 3 and r.latency > 0 for r in results.values())
+
+
+def test_batches_are_split_by_vocoder_iterations():
+  synth = _FakeSynthesizer()
+  batcher = SynthesisBatcher(synth, max_batch_size=8, max_wait_ms=200).start()
+  _run_concurrently(batcher, ['a', 'b', 'c'], iters=[4, 16, 4])
+  assert sorted((sorted(texts), iters) for texts, iters in synth.batches) == [
+    (['a', 'c'], 4), (['b'], 16)]
+
+
+def test_texts_of_different_lengths_share_a_pass():
+  synth = _FakeSynthesizer()
+  batcher = SynthesisBatcher(synth, max_batch_size=8, max_wait_ms=200).start()
+  results = _run_concurrently(batcher, ['abcd', 'ef', 'ghi', 'jk'])
+  assert len(synth.batches) == 1
+  texts = synth.batches[0][0]
+  assert sorted(texts) == ['abcd', 'ef', 'ghi', 'jk']
+  assert [len(text) for text in texts] == [2, 2, 3, 4]  # Shortest first
+  assert {text: r.wav for text, r in results.items()} == {
+    'abcd': b'ABCD', 'ef': b'EF', 'ghi': b'GHI', 'jk': b'JK'}
+  assert all(r.batch_size == 4 for r in results.values())
+
+
+def test_much_longer_texts_get_their_own_pass():
+  synth = _FakeSynthesizer()
+  batcher = SynthesisBatcher(synth, max_batch_size=8, max_wait_ms=200, max_padding=2.0).start()
+  _run_concurrently(batcher, ['abcdefgh', 'ab', 'abc', 'abcdefghij'])
+  assert [texts for texts, _ in synth.batches] == [['ab', 'abc'], ['abcdefgh', 'abcdefghij']]
+
+
+def test_full_queue_is_rejected():
+  synth = _FakeSynthesizer()
+  synth.release.clear()
+  batcher = SynthesisBatcher(synth, max_batch_size=1, max_wait_ms=0, max_pending=1).start()
+  first = Thread(target=batcher.synthesize, args=('busy',))
+  first.start()
+  while not batcher._queue.empty():  # Wait for the worker to pick up the first request
+    time.sleep(0.001)
+  second = Thread(target=batcher.synthesize, args=('queued',))
+  second.start()
+  while batcher._queue.empty():
+    time.sleep(0.001)
+  with pytest.raises(queue.Full):
+    batcher.synthesize('rejected')
+  synth.release.set()
+  first.join()
+  second.join()
+
+
+def test_errors_are_raised_in_the_requesting_thread():
+  class _Broken:
+    def synthesize_batch(self, texts, griffin_lim_iters=None):
+      raise ValueError('boom')
+  batcher = SynthesisBatcher(_Broken(), max_wait_ms=0).start()
+  with pytest.raises(ValueError):
+    batcher.synthesize('text')
+
+
+def test_batched_texts_of_different_lengths_run_once(monkeypatch):
+  synthesizer = pytest.importorskip('synthesizer')
+  runs = []
+  class _Session:
+    def run(self, fetches, feed_dict):
+      inputs, lengths = feed_dict['inputs'], feed_dict['input_lengths']
+      runs.append((inputs.shape, list(lengths)))
+      return np.ones([len(inputs), 10 * inputs.shape[1], 4])
+  class _Model:
+    inputs, input_lengths, linear_outputs = 'inputs', 'input_lengths', 'linear_outputs'
+  synth = synthesizer.Synthesizer()
+  synth.model, synth.session, synth.vocoder = _Model(), _Session(), 'fast'
+  monkeypatch.setattr(synthesizer.audio, 'inv_spectrogram_fast', lambda linear, iters: linear[0])
+  monkeypatch.setattr(synthesizer.audio, 'find_endpoint', len)
+  monkeypatch.setattr(synthesizer.audio, 'to_pcm16', lambda wav: wav)
+  monkeypatch.setattr(synthesizer.audio, 'save_pcm16', lambda pcm, out: out.write(pcm.tobytes()))
+  batcher = SynthesisBatcher(synth, max_batch_size=8, max_wait_ms=200).start()
+  results = _run_concurrently(batcher, ['hello there', 'hello', 'hi there'])
+  assert all(r.wav and r.batch_size == 3 for r in results.values())
+  assert len(runs) == 1
+  assert runs[0][1] == sorted(runs[0][1]) and len(set(runs[0][1])) == 3
@@ -0,0 +1,44 @@
+import numpy as np
+from util.cache import AudioCache
+
+
+def test_key_depends_on_sequence_and_salt():
+  assert AudioCache.key([1, 2, 3]) == AudioCache.key([1, 2, 3])
+  assert AudioCache.key([1, 2, 3]) != AudioCache.key([1, 2, 4])
+  assert AudioCache.key([1, 2, 3], 'a') != AudioCache.key([1, 2, 3], 'b')
+
+
+def test_memory_tier_evicts_least_recently_used():
+  cache = AudioCache(max_memory_bytes=200)
+  cache.put('a', np.zeros(50, dtype=np.int16))
+  cache.put('b', np.zeros(50, dtype=np.int16))
+  assert cache.get('a') is not None  # 'b' is now least recently used
+  cache.put('c', np.zeros(50, dtype=np.int16))
+  assert cache.get('b') is None
+  assert cache.get('a') is not None
+  assert cache.get('c') is not None
+  stats = cache.stats()
+  assert stats['memory_evictions'] == 1
+  assert stats['memory_bytes'] == 200
+  assert stats['hits'] == 3
+  assert stats['misses'] == 1
+
+
+def test_disk_tier_survives_restart(tmpdir):
+  pcm = np.arange(-100, 100, dtype=np.int16)
+  AudioCache(str(tmpdir)).put('greeting', pcm)
+  cache = AudioCache(str(tmpdir))
+  np.testing.assert_array_equal(cache.get('greeting'), pcm)
+  assert cache.stats()['disk_hits'] == 1
+  assert cache.get('missing') is None
+
+
+def test_disk_tier_evicts_over_size_limit(tmpdir):
+  cache = AudioCache(str(tmpdir), max_memory_bytes=0, max_disk_bytes=500)
+  for name in ['a', 'b', 'c']:
+    cache.put(name, np.zeros(100, dtype=np.int16))
+  stats = cache.stats()
+  assert stats['disk_entries'] == 2
+  assert stats['disk_evictions'] == 1
+  assert cache.get('a') is None
+  assert len(tmpdir.listdir()) == 2
@@ -0,0 +1,56 @@
+import numpy as np
+from threading import Thread
+from streaming import AudioRingBuffer, StreamingSpeaker, split_sentences
+
+
+def test_split_sentences():
+  assert split_sentences('') == []
+  assert split_sentences('Hello there') == ['Hello there']
+  assert split_sentences('One. Two!  Three?') == ['One.', 'Two!', 'Three?']
+  assert split_sentences('Ask Dr. Smith. He knows.') == ['Ask Dr. Smith.', 'He knows.']
+  assert split_sentences('Line one.\nLine two.') == ['Line one.', 'Line two.']
+
+
+def test_ring_buffer_wraps_around():
+  ring = AudioRingBuffer(4)
+  ring.write([1, 2, 3])
+  assert list(ring.read(2)) == [1, 2]
+  ring.write([4, 5, 6])
+  assert len(ring) == 4
+  assert list(ring.read(10)) == [3, 4, 5, 6]
+  ring.close()
+  assert len(ring.read(10)) == 0
+
+
+def test_ring_buffer_blocks_writer_until_read():
+  ring = AudioRingBuffer(8)
+  samples = np.arange(100, dtype=np.int16)
+  writer = Thread(target=lambda: (ring.write(samples), ring.close()))
+  writer.start()
+  out = []
+  while True:
+    chunk = ring.read(3)
+    if not len(chunk):
+      break
+    out.extend(chunk)
+  writer.join()
+  assert out == list(samples)
+
+
+class _FakeSynthesizer:
+  def __init__(self):
+    self.texts = []
+
+  def synthesize_pcm(self, text):
+    self.texts.append(text)
+    return np.full(len(text), len(self.texts), dtype=np.int16)
+
+
+def test_streaming_speaker_plays_every_sentence_in_order():
+  synth = _FakeSynthesizer()
+  played = []
+  speaker = StreamingSpeaker(synth, sink=played.append, sample_rate=100, buffer_sec=0.1, chunk_sec=0.05)
+  speaker.speak('First sentence. Second one! Third?')
+  assert synth.texts == ['First sentence.', 'Second one!', 'Third?']
+  samples = list(np.concatenate(played))
+  assert samples == [1] * 15 + [2] * 11 + [3] * 6
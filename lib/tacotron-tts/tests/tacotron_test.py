@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from hparams import hparams
+from models import create_model
+from text import text_to_sequence
+
+
+def _run(session, model, seqs):
+  # Pads the sequences into one batch the way Synthesizer does
+  lengths = np.asarray([len(seq) for seq in seqs], dtype=np.int32)
+  inputs = np.zeros([len(seqs), np.max(lengths)], dtype=np.int32)
+  for i, seq in enumerate(seqs):
+    inputs[i, :len(seq)] = seq
+  return session.run([model.mel_outputs, model.linear_outputs],
+    feed_dict={model.inputs: inputs, model.input_lengths: lengths})
+
+
+def test_padded_batch_matches_single_sequence():
+  hp = tf.contrib.training.HParams(**hparams.values())
+  hp.set_hparam('max_iters', 8)
+  short = text_to_sequence('Hi there.', ['english_cleaners'])
+  long = text_to_sequence('A much longer sentence that pads the short one.', ['english_cleaners'])
+  with tf.Graph().as_default():
+    tf.set_random_seed(0)
+    inputs = tf.placeholder(tf.int32, [None, None], 'inputs')
+    input_lengths = tf.placeholder(tf.int32, [None], 'input_lengths')
+    with tf.variable_scope('model'):
+      model = create_model('tacotron', hp)
+      model.initialize(inputs, input_lengths)
+    with tf.Session() as session:
+      session.run(tf.global_variables_initializer())
+      alone_mel, alone_linear = _run(session, model, [short])
+      batch_mel, batch_linear = _run(session, model, [long, short])
+  np.testing.assert_allclose(batch_mel[1], alone_mel[0], rtol=1e-4, atol=1e-5)
+  np.testing.assert_allclose(batch_linear[1], alone_linear[0], rtol=1e-4, atol=1e-5)
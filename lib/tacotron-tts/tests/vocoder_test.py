@@ -0,0 +1,37 @@
+import numpy as np
+from util.vocoder import FastGriffinLim
+
+
+def _chirp(n, sample_rate=20000):
+  t = np.arange(n) / sample_rate
+  return 0.5 * np.sin(2 * np.pi * (200 + 800 * t) * t)
+
+
+def _spectral_convergence(vocoder, S, y):
+  return np.linalg.norm(np.abs(vocoder.stft(y)) - S) / np.linalg.norm(S)
+
+
+def test_stft_istft_round_trip():
+  vocoder = FastGriffinLim(n_fft=2048, hop_length=250, win_length=1000)
+  y = _chirp(250 * 80)
+  D = vocoder.stft(y)
+  assert D.shape == (1025, 81)
+  np.testing.assert_allclose(vocoder.istft(D), y, atol=1e-4)
+
+
+def test_griffin_lim_converges_with_more_iterations():
+  vocoder = FastGriffinLim(n_fft=512, hop_length=64, win_length=256)
+  y = _chirp(64 * 100, sample_rate=8000)
+  S = np.abs(vocoder.stft(y))
+  errors = [_spectral_convergence(vocoder, S, vocoder(S, iters)) for iters in (0, 4, 16)]
+  assert errors[0] > errors[1] > errors[2]
+  assert len(vocoder(S, 4)) == len(y)
+
+
+def test_warm_start_from_previous_phase():
+  vocoder = FastGriffinLim(n_fft=512, hop_length=64, win_length=256)
+  y = _chirp(64 * 100, sample_rate=8000)
+  D = vocoder.stft(y)
+  S = np.abs(D)
+  warm = vocoder(S, 2, init_angles=D / (S + 1e-16))
+  assert _spectral_convergence(vocoder, S, warm) < _spectral_convergence(vocoder, S, vocoder(S, 2))
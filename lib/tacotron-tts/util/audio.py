@@ -5,6 +5,7 @@ import numpy as np
 import tensorflow as tf
 from scipy import signal
 from hparams import hparams
+from util.vocoder import FastGriffinLim
 
 
 def load_wav(path):
@@ -12,8 +13,17 @@ def load_wav(path):
 
 
 def save_wav(wav, path):
-  wav *= 32767 / max(0.01, np.max(np.abs(wav)))
-  librosa.output.write_wav(path, wav.astype(np.int16), hparams.sample_rate)
+  save_pcm16(to_pcm16(wav), path)
+
+
+def save_pcm16(pcm, path):
+  librosa.output.write_wav(path, pcm, hparams.sample_rate)
+
+
+def to_pcm16(wav):
+  '''Peak-normalizes a float waveform and converts it to int16 PCM samples.'''
+  wav = wav * (32767 / max(0.01, np.max(np.abs(wav))))
+  return wav.astype(np.int16)
 
 
 def preemphasis(x):
@@ -36,6 +46,19 @@ def inv_spectrogram(spectrogram):
   return inv_preemphasis(_griffin_lim(S ** hparams.power))          # Reconstruct phase
 
 
+def inv_spectrogram_fast(spectrogram, iters=None):
+  '''Converts spectrogram to waveform using the fast Griffin-Lim vocoder (util/vocoder.py)
+
+  Args:
+    spectrogram: normalized linear spectrogram with shape [num_freq, T]
+    iters: Griffin-Lim iterations; defaults to hparams.fast_griffin_lim_iters
+  '''
+  if iters is None:
+    iters = hparams.fast_griffin_lim_iters
+  S = _db_to_amp(_denormalize(spectrogram) + hparams.ref_level_db)
+  return inv_preemphasis(_fast_griffin_lim()(S ** hparams.power, iters))
+
+
 def inv_spectrogram_tensorflow(spectrogram):
   '''Builds computational graph to convert spectrogram to waveform using TensorFlow.
 
@@ -46,6 +69,15 @@ def inv_spectrogram_tensorflow(spectrogram):
   return _griffin_lim_tensorflow(tf.pow(S, hparams.power))
 
 
+def inv_spectrogram_tensorflow_batch(spectrograms):
+  '''Like inv_spectrogram_tensorflow, but for a [N, T_out, F] batch of spectrograms.
+
+  Returns a [N, samples] Tensor; every waveform is as long as the longest spectrogram.
+  '''
+  S = _db_to_amp_tensorflow(_denormalize_tensorflow(spectrograms) + hparams.ref_level_db)
+  return _griffin_lim_tensorflow(tf.pow(S, hparams.power), batched=True)
+
+
 def melspectrogram(y):
   D = _stft(preemphasis(y))
   S = _amp_to_db(_linear_to_mel(np.abs(D)))
@@ -75,20 +107,30 @@ def _griffin_lim(S):
   return y
 
 
-def _griffin_lim_tensorflow(S):
+_vocoder = None
+
+def _fast_griffin_lim():
+  global _vocoder
+  if _vocoder is None:
+    _vocoder = FastGriffinLim(*_stft_parameters(), momentum=hparams.griffin_lim_momentum)
+  return _vocoder
+
+
+def _griffin_lim_tensorflow(S, batched=False):
   '''TensorFlow implementation of Griffin-Lim
   Based on https://github.com/Kyubyong/tensorflow-exercises/blob/master/Audio_Processing.ipynb
   '''
   with tf.variable_scope('griffinlim'):
     # TensorFlow's stft and istft operate on a batch of spectrograms; create batch of size 1
-    S = tf.expand_dims(S, 0)
+    if not batched:
+      S = tf.expand_dims(S, 0)
     S_complex = tf.identity(tf.cast(S, dtype=tf.complex64))
     y = _istft_tensorflow(S_complex)
     for i in range(hparams.griffin_lim_iters):
       est = _stft_tensorflow(y)
       angles = est / tf.cast(tf.maximum(1e-8, tf.abs(est)), tf.complex64)
       y = _istft_tensorflow(S_complex * angles)
-    return tf.squeeze(y, 0)
+    return y if batched else tf.squeeze(y, 0)
 
 
 def _stft(y):
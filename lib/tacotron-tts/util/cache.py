@@ -0,0 +1,153 @@
+import hashlib
+import os
+import wave
+import numpy as np
+from collections import OrderedDict
+from threading import Lock
+
+
+class AudioCache:
+  '''Content-addressed cache of synthesized audio (int16 PCM).
+
+  Entries are keyed by the cleaned symbol sequence plus a salt identifying everything else that
+  affects the output (hparams, checkpoint, vocoder settings), so "We are connected" and
+  "we are  connected." share an entry when the cleaners map them to the same sequence.
+
+  There are two tiers, each evicting least-recently-used entries once over its byte limit:
+    * memory: an OrderedDict of numpy arrays
+    * disk (optional): one WAV file per entry under directory, which survives restarts
+
+  Args:
+    directory: where to keep the disk tier, or None for a memory-only cache
+    sample_rate: sample rate written into the WAV headers of the disk tier
+    max_memory_bytes: size limit of the memory tier
+    max_disk_bytes: size limit of the disk tier
+  '''
+  def __init__(self, directory=None, sample_rate=20000, max_memory_bytes=64 << 20,
+               max_disk_bytes=512 << 20):
+    self._directory = directory
+    self._sample_rate = sample_rate
+    self._max_memory_bytes = max_memory_bytes
+    self._max_disk_bytes = max_disk_bytes
+    self._memory = OrderedDict()
+    self._disk = OrderedDict()
+    self._lock = Lock()
+    self.memory_bytes = 0
+    self.disk_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.disk_hits = 0
+    self.memory_evictions = 0
+    self.disk_evictions = 0
+    if directory is not None:
+      os.makedirs(directory, exist_ok=True)
+      self._load_disk_index()
+
+
+  @staticmethod
+  def key(sequence, salt=''):
+    '''Returns the cache key for a symbol sequence (list of ints) and salt string.'''
+    h = hashlib.sha1(salt.encode('utf-8'))
+    h.update(np.asarray(sequence, dtype=np.int32).tobytes())
+    return h.hexdigest()
+
+
+  def get(self, key):
+    '''Returns the cached samples for key, or None.'''
+    with self._lock:
+      pcm = self._memory.get(key)
+      if pcm is not None:
+        self._memory.move_to_end(key)
+        self.hits += 1
+        return pcm
+      if key in self._disk:
+        pcm = self._read_wav(self._path(key))
+        if pcm is not None:
+          self._disk.move_to_end(key)
+          os.utime(self._path(key))
+          self._put_memory(key, pcm)
+          self.hits += 1
+          self.disk_hits += 1
+          return pcm
+        self._remove_disk(key)
+      self.misses += 1
+      return None
+
+
+  def put(self, key, pcm):
+    pcm = np.asarray(pcm, dtype=np.int16)
+    with self._lock:
+      self._put_memory(key, pcm)
+      if self._directory is not None and key not in self._disk:
+        self._write_wav(self._path(key), pcm)
+        self._disk[key] = os.path.getsize(self._path(key))
+        self.disk_bytes += self._disk[key]
+        while self.disk_bytes > self._max_disk_bytes and len(self._disk) > 1:
+          self._remove_disk(next(iter(self._disk)))
+          self.disk_evictions += 1
+
+
+  def stats(self):
+    with self._lock:
+      return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'disk_hits': self.disk_hits,
+        'memory_entries': len(self._memory),
+        'memory_bytes': self.memory_bytes,
+        'memory_evictions': self.memory_evictions,
+        'disk_entries': len(self._disk),
+        'disk_bytes': self.disk_bytes,
+        'disk_evictions': self.disk_evictions,
+      }
+
+
+  def _put_memory(self, key, pcm):
+    if key in self._memory:
+      self.memory_bytes -= self._memory.pop(key).nbytes
+    self._memory[key] = pcm
+    self.memory_bytes += pcm.nbytes
+    while self.memory_bytes > self._max_memory_bytes and len(self._memory) > 1:
+      _, evicted = self._memory.popitem(last=False)
+      self.memory_bytes -= evicted.nbytes
+      self.memory_evictions += 1
+
+
+  def _load_disk_index(self):
+    # Oldest first, so eviction order survives restarts:
+    names = [n for n in os.listdir(self._directory) if n.endswith('.wav')]
+    paths = [os.path.join(self._directory, n) for n in names]
+    for path in sorted(paths, key=os.path.getmtime):
+      key = os.path.basename(path)[:-len('.wav')]
+      self._disk[key] = os.path.getsize(path)
+      self.disk_bytes += self._disk[key]
+
+
+  def _remove_disk(self, key):
+    self.disk_bytes -= self._disk.pop(key)
+    try:
+      os.remove(self._path(key))
+    except OSError:
+      pass
+
+
+  def _path(self, key):
+    return os.path.join(self._directory, key + '.wav')
+
+
+  def _write_wav(self, path, pcm):
+    tmp_path = path + '.tmp'
+    with wave.open(tmp_path, 'wb') as f:
+      f.setnchannels(1)
+      f.setsampwidth(2)
+      f.setframerate(self._sample_rate)
+      f.writeframes(pcm.tobytes())
+    os.replace(tmp_path, path)
+
+
+  def _read_wav(self, path):
+    try:
+      with wave.open(path, 'rb') as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    except (OSError, EOFError, wave.Error):
+      return None
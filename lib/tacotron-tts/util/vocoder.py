@@ -0,0 +1,83 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+class FastGriffinLim:
+  '''Vectorized NumPy implementation of the fast Griffin-Lim algorithm.
+
+  Uses the momentum update from Perraudin et al., "A fast Griffin-Lim algorithm" (2013), which
+  converges in a fraction of the iterations plain Griffin-Lim needs. The analysis window and the
+  overlap-add normalization are computed once and reused, and framing / overlap-add are done with
+  strided views and bincount rather than a Python loop over frames.
+
+  The STFT conventions (centered frames, reflect padding, periodic Hann window of win_length
+  zero-padded to n_fft) match librosa.stft / librosa.istft as used in util/audio.py.
+  '''
+  def __init__(self, n_fft, hop_length, win_length, momentum=0.99):
+    self.n_fft = n_fft
+    self.hop_length = hop_length
+    self.momentum = momentum
+    n = np.arange(win_length)
+    window = 0.5 - 0.5 * np.cos(2 * np.pi * n / win_length)
+    left = (n_fft - win_length) // 2
+    self._window = np.zeros(n_fft)
+    self._window[left:left + win_length] = window
+    self._window_sums = {}
+
+
+  def __call__(self, S, iters=16, init_angles=None):
+    '''Reconstructs a waveform from a magnitude spectrogram.
+
+    Args:
+      S: magnitude spectrogram with shape [1 + n_fft/2, T]
+      iters: number of iterations; fewer is faster at some cost in quality
+      init_angles: optional complex array shaped like S with unit-magnitude initial phases, e.g.
+        from a previous reconstruction of a similar spectrogram. Defaults to zero phase.
+
+    Returns:
+      float waveform with hop_length * (T - 1) samples
+    '''
+    S = np.abs(S)
+    angles = np.ones(S.shape, dtype=np.complex64) if init_angles is None else init_angles
+    rebuilt = np.zeros(S.shape, dtype=np.complex64)
+    alpha = self.momentum / (1 + self.momentum)
+    for i in range(iters):
+      previous = rebuilt
+      rebuilt = self.stft(self.istft(S * angles))
+      angles = rebuilt - alpha * previous
+      angles /= np.abs(angles) + 1e-16
+    return self.istft(S * angles)
+
+
+  def stft(self, y):
+    pad = self.n_fft // 2
+    y = np.pad(y, pad, mode='reflect')
+    n_frames = 1 + (len(y) - self.n_fft) // self.hop_length
+    frames = as_strided(y, shape=(n_frames, self.n_fft),
+      strides=(y.strides[0] * self.hop_length, y.strides[0]))
+    return np.fft.rfft(frames * self._window, axis=1).T.astype(np.complex64)
+
+
+  def istft(self, D):
+    n_frames = D.shape[1]
+    frames = np.fft.irfft(D.T, n=self.n_fft, axis=1) * self._window
+    indices = self._frame_indices(n_frames)
+    length = self.n_fft + self.hop_length * (n_frames - 1)
+    y = np.bincount(indices.ravel(), weights=frames.ravel(), minlength=length)
+    window_sum = self._window_sum(n_frames)
+    nonzero = window_sum > 1e-8
+    y[nonzero] /= window_sum[nonzero]
+    pad = self.n_fft // 2
+    return y[pad:length - pad]
+
+
+  def _frame_indices(self, n_frames):
+    return np.arange(n_frames)[:, None] * self.hop_length + np.arange(self.n_fft)
+
+
+  def _window_sum(self, n_frames):
+    if n_frames not in self._window_sums:
+      squared = np.tile(self._window ** 2, n_frames)
+      self._window_sums[n_frames] = np.bincount(
+        self._frame_indices(n_frames).ravel(), weights=squared)
+    return self._window_sums[n_frames]
@@ -29,73 +29,51 @@ import talkey
 from pygame import mixer
 import sys
 import subprocess
+import threading
 
 n=1
-#def say(rand,n,mixer)
-def produce():
-    sys.path.append('../lib/tacotron-tts/')
-    import argparse
-    import os
-    import re
-    from hparams import hparams, hparams_debug_string
-    from synthesizer import Synthesizer
-    import subprocess
 
-    x = open("../lib/tacotron-tts/text.txt", "r+")
-    x = str(x.readline())
-    sentences = [
-        x
-    ]
+#The engine keeps tacotron loaded between replies, instead of spawning "python3 Speech.py" per reply.
+TACOTRON_DIR = '../lib/tacotron-tts/'
+INCLUDE_DIR = './include/' #the message bus, also when this file is run on its own
+CHECKPOINT = TACOTRON_DIR + 'model.ckpt'
+AUDIO_CACHE = TACOTRON_DIR + '.cache/audio' #repeated phrases are replayed from here instead of resynthesized
+engine = None
+engine_error = None #why the engine failed to load; it is not rebuilt on every reply after that
+_engine_lock = threading.Lock() #main.py warms the engine up on a background thread
 
-
-    def get_output_base_path(checkpoint_path):
-      base_dir = os.path.dirname(checkpoint_path)
-      m = re.compile(r'.*?\.ckpt\-([0-9]+)').match(checkpoint_path)
-      name = 'eval-%d' % int(m.group(1)) if m else 'eval'
-      return os.path.join(base_dir, name)
-
-
-    def run_eval(args):
-      print(hparams_debug_string())
-      synth = Synthesizer()
-      synth.load(args.checkpoint)
-      base_path = get_output_base_path(args.checkpoint)
-      for i, text in enumerate(sentences):
-        path = '%s-%d.wav' % (base_path, i)
-        print('Synthesizing: %s' % path)
-        with open(path, 'wb') as f:
-          f.write(synth.synthesize(text))
-
-
-    def main():
-      parser = argparse.ArgumentParser()
-      parser.add_argument('--checkpoint', default='../lib/tacotron-tts/model.ckpt')
-      parser.add_argument('--hparams', default='',
-        help='Hyperparameter overrides as a comma-separated list of name=value pairs')
-      args = parser.parse_args()
-      os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-      hparams.parse(args.hparams)
-      run_eval(args)
-
-
-    if __name__ == '__main__':
-      main()
-      import pygame
-      pygame.mixer.init()
-      pygame.mixer.music.load("../lib/tacotron-tts/eval-0.wav")
-      pygame.mixer.music.play()
-      while pygame.mixer.music.get_busy() == True:
-        continue
+def start():
+    '''
+    Loads the speech synthesizer once; call at startup so the first reply doesn't pay for it.
+    '''
+    global engine, engine_error
+    with _engine_lock:
+        if engine_error is not None:
+            raise engine_error
+        if engine is None:
+            for path in (TACOTRON_DIR, INCLUDE_DIR):
+                if path not in sys.path:
+                    sys.path.append(path)
+            try:
+                from engine import SpeechEngine
+                engine = SpeechEngine(CHECKPOINT, cache_dir=AUDIO_CACHE).start()
+            except Exception as e:
+                engine_error = e
+                raise
+            #Anything published on the bus's tts topic is spoken, from this process or another one
+            import bus
+            bus.default().on(bus.TTS, engine.say)
+    return engine
 
 def say(rand,n,mixer):
-    file = open("../lib/tacotron-tts/text.txt", "w")
     rand = ''.join(rand)
-    file.write(rand)
-    file.close()
-    #neat little trick where you can call specific elements in the console, and call specific elements outside as well.
-    subprocess.call("python3 Speech.py", shell=True)
+    start()
+    import bus
+    bus.default().publish(bus.TTS, rand)
 
 
 if __name__ == "__main__":
     print(__about__)
-    produce()
+    #python3 Speech.py <text> speaks the text once
+    start().say(' '.join(sys.argv[1:]) or 'speech engine ready', block=True)
+    engine.stop()
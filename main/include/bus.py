@@ -0,0 +1,306 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  MESSAGE BUS
+******************************************
+'''
+import errno
+import json
+import os
+import queue
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+#========================
+#   Topics
+#========================
+UTTERANCES = 'utterance'  #anything the user said that no intent handled, as a string
+SENTIMENT = 'sentiment'   #{'text': ..., 'label': 'pos'|'neg'|'neu', 'scores': {...}} from sent.py
+IDENTITY = 'identity'     #{'nameFirst': ...} from the face recognizer
+TTS = 'tts'               #text to be spoken
+
+#Where the assistant serves its bus to the other processes (face recognizer, sentiment labeller)
+SOCKET_PATH = os.environ.get('PARAGON_BUS', os.path.join(tempfile.gettempdir(), 'paragon-bus.sock'))
+SEND_TIMEOUT = 5.0 #seconds a subscribed process may stop reading before it is dropped
+
+_CLOSED = object()
+
+class Subscription():
+
+    '''
+    A bounded queue of the messages published on one topic. When it is full the publisher
+    waits (backpressure), or if drop_oldest is set the oldest message is thrown away instead,
+    for subscribers that only care about the latest state.
+    '''
+    def __init__(self, bus, topic, maxsize=64, drop_oldest=False):
+        self.bus = bus
+        self.topic = topic
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.closed = False
+        self.queue = queue.Queue(maxsize)
+
+    def _deliver(self, message, timeout):
+        if self.closed:
+            return
+        if not self.drop_oldest:
+            self.queue.put(message, timeout=timeout)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        '''
+        Returns the next message, or None after timeout seconds.
+        '''
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __iter__(self):
+        while True:
+            message = self.queue.get()
+            if message is _CLOSED:
+                return
+            yield message
+
+    def close(self):
+        '''
+        Unsubscribes; messages not yet taken are thrown away, and anyone still iterating stops.
+        '''
+        self.bus.unsubscribe(self)
+        with self.queue.mutex:
+            #emptied, so a publisher blocked on the full queue is let through too
+            self.closed = True
+            self.queue.queue.clear()
+            self.queue.queue.append(_CLOSED)
+            self.queue.not_empty.notify_all()
+            self.queue.not_full.notify_all()
+
+class Bus():
+
+    '''
+    In-process publish/subscribe. Every subscriber of a topic gets its own copy of each message.
+    '''
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, maxsize=64, drop_oldest=False):
+        subscription = Subscription(self, topic, maxsize, drop_oldest)
+        with self._lock:
+            self._topics.setdefault(topic, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+
+    def publish(self, topic, message, timeout=None):
+        '''
+        Hands the message to every subscriber of the topic. Blocks while a subscriber's queue is
+        full; raises queue.Full if that takes longer than timeout seconds.
+        '''
+        with self._lock:
+            subscribers = list(self._topics.get(topic, []))
+        for subscription in subscribers:
+            subscription._deliver(message, timeout)
+        return len(subscribers)
+
+    def on(self, topic, callback, maxsize=64):
+        '''
+        Calls callback(message) on a background thread for every message on the topic.
+        '''
+        subscription = self.subscribe(topic, maxsize)
+        def run():
+            for message in subscription:
+                try:
+                    callback(message)
+                except Exception as e:
+                    print("[Bus] %s handler failed: %s" % (topic, e))
+        threading.Thread(target=run, name='bus-' + topic, daemon=True).start()
+        return subscription
+
+#========================
+#   Between processes
+#========================
+#The bus is served over a Unix socket as JSON lines: {"op": "publish", "topic": ..., "message": ...}
+#or {"op": "subscribe", "topic": ...}, after which the server streams {"topic": ..., "message": ...}
+#lines for that topic. A slow reader fills the socket buffer and then its subscription queue,
+#which in turn holds up the publisher, so backpressure carries across processes too; one that
+#stops reading for send_timeout seconds is disconnected so it can't hold the publisher forever.
+class BusServer():
+
+    def __init__(self, bus, path=SOCKET_PATH, send_timeout=SEND_TIMEOUT):
+        self.bus = bus
+        self.path = path
+        self.send_timeout = send_timeout
+        if os.path.exists(path):
+            #a socket file left by a server that died is replaced, a live server's is not
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(path)
+            else:
+                raise OSError(errno.EADDRINUSE, 'A bus server is already running', path)
+            finally:
+                probe.close()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(path)
+        self._sock.listen(8)
+
+    def start(self):
+        threading.Thread(target=self._accept, name='bus-server', daemon=True).start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        subscriptions = []
+        lock = threading.Lock()
+        #only sends time out (SO_SNDTIMEO); a subscriber that never writes is not a slow one
+        seconds = int(self.send_timeout)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+                        struct.pack('ll', seconds, int((self.send_timeout - seconds) * 1e6)))
+        def forward(subscription):
+            for message in subscription:
+                line = json.dumps({'topic': subscription.topic, 'message': message}) + '\n'
+                try:
+                    with lock:
+                        conn.sendall(line.encode('utf-8'))
+                except OSError:
+                    #too slow or gone: stop taking messages for it and end the connection
+                    subscription.close()
+                    try:
+                        conn.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    return
+        try:
+            for line in conn.makefile('r', encoding='utf-8'):
+                request = json.loads(line)
+                if request.get('op') == 'publish':
+                    self.bus.publish(request['topic'], request.get('message'))
+                elif request.get('op') == 'subscribe':
+                    subscription = self.bus.subscribe(request['topic'])
+                    subscriptions.append(subscription)
+                    threading.Thread(target=forward, args=(subscription,), daemon=True).start()
+        except (OSError, ValueError):
+            pass
+        finally:
+            for subscription in subscriptions:
+                subscription.close()
+            conn.close()
+
+    def close(self):
+        self._sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class BusClient():
+
+    '''
+    The other end of a BusServer, for processes outside the assistant.
+    '''
+    def __init__(self, path=SOCKET_PATH, timeout=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(path)
+        self._sock.settimeout(None)
+        self._lock = threading.Lock()
+        self._lines = None
+
+    def _send(self, request):
+        with self._lock:
+            self._sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+
+    def publish(self, topic, message):
+        self._send({'op': 'publish', 'topic': topic, 'message': message})
+
+    def subscribe(self, *topics):
+        '''
+        Subscribes to the topics; returns an iterator of (topic, message).
+        '''
+        for topic in topics:
+            self._send({'op': 'subscribe', 'topic': topic})
+        if self._lines is None:
+            self._lines = self._sock.makefile('r', encoding='utf-8')
+        return ((line['topic'], line['message']) for line in map(json.loads, self._lines))
+
+    def close(self):
+        self._sock.close()
+
+_bus = None
+_bus_lock = threading.Lock()
+
+def default():
+    '''
+    The assistant's own bus.
+    '''
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = Bus()
+    return _bus
+
+def serve(path=SOCKET_PATH):
+    '''
+    Shares the default bus with other processes.
+    '''
+    return BusServer(default(), path).start()
+
+def connect(path=SOCKET_PATH, timeout=2.0):
+    return BusClient(path, timeout)
+
+if __name__ == "__main__":
+    print(__about__)
+    path = os.path.join(tempfile.gettempdir(), 'paragon-bus-demo.sock')
+    server = serve(path)
+    received = []
+    default().on(UTTERANCES, received.append)
+    client = connect(path)
+    t0 = time.time()
+    for i in range(10000):
+        client.publish(UTTERANCES, 'message %d' % i)
+    while len(received) < 10000:
+        time.sleep(0.01)
+    print("10000 messages over the bus socket in %0.3f s" % (time.time() - t0))
+    client.close()
+    server.close()
@@ -0,0 +1,233 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  LOOKUP CACHE
+******************************************
+'''
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+#========================
+#   Time to live
+#========================
+#Seconds an answer from each source stays fresh. After that it is still served for STALE_FOR
+#seconds while a background refresh fetches a new one.
+SOURCE_TTLS = {
+    'wikipedia': 7 * 24 * 3600,
+    'arxiv': 24 * 3600,
+    'wolfram': 3600,
+    'noaa': 15 * 60,
+    'rss': 10 * 60,
+}
+DEFAULT_TTL = 5 * 60
+STALE_FOR = 24 * 3600
+CACHE_PATH = './Data/Databases/Cache/lookups.sqlite'
+
+class Fresh():
+
+    '''
+    What a fetch function can return instead of a bare value, to say how long the value stays
+    fresh (e.g. from the response's Cache-Control header), or that it must not be kept at all.
+    A ttl of None falls back to the source's TTL; 0 keeps the value, but already stale, so the
+    next lookup returns it and refetches it in the background.
+    '''
+    def __init__(self, value, ttl=None, store=True):
+        self.value = value
+        self.ttl = ttl
+        self.store = store
+
+def max_age(headers):
+    '''
+    Reads the lifetime out of HTTP response headers. Returns seconds, 0 for no-cache, or None
+    if the server didn't say.
+    '''
+    control = headers.get('Cache-Control', '') if headers else ''
+    if 'no-cache' in control:
+        return 0
+    found = re.search(r'max-age=(\d+)', control)
+    return int(found.group(1)) if found else None
+
+def no_store(headers):
+    '''
+    True if HTTP response headers forbid keeping the response.
+    '''
+    return 'no-store' in (headers.get('Cache-Control', '') if headers else '')
+
+class LookupCache():
+
+    '''
+    Two tier cache for answers from the web: an LRU dict in memory in front of a SQLite table
+    on disk, so answers survive restarts. Entries are stale-while-revalidate: once an entry
+    is past its TTL it is still returned immediately while a background thread refetches it,
+    and if the network is down the last known answer is returned instead of an error.
+    '''
+    def __init__(self, path=CACHE_PATH, ttls=None, stale_for=STALE_FOR, max_memory=512):
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.stale_for = stale_for
+        self.max_memory = max_memory
+        self.memory = OrderedDict()
+        self.hits = self.stale_hits = self.misses = 0
+        self._lock = threading.RLock()
+        self._refreshing = set()
+        self.db = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS entries (source TEXT, key TEXT, value BLOB, '
+                            'fresh_until REAL, PRIMARY KEY (source, key))')
+            self.db.commit()
+
+    def _read(self, source, key):
+        with self._lock:
+            entry = self.memory.get((source, key))
+            if entry is not None:
+                self.memory.move_to_end((source, key))
+                return entry
+            if self.db is None:
+                return None
+            row = self.db.execute('SELECT value, fresh_until FROM entries WHERE source=? AND key=?',
+                                  (source, key)).fetchone()
+            if row is None:
+                return None
+            entry = (pickle.loads(row[0]), row[1])
+            self._remember(source, key, entry)
+            return entry
+
+    def _remember(self, source, key, entry):
+        self.memory[(source, key)] = entry
+        self.memory.move_to_end((source, key))
+        while len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+
+    def put(self, source, key, value, ttl=None):
+        if ttl is None: #the server didn't say, use the TTL we chose for the source
+            ttl = self.ttls.get(source, DEFAULT_TTL)
+        entry = (value, time.time() + ttl)
+        with self._lock:
+            self._remember(source, key, entry)
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                                (source, key, pickle.dumps(value), entry[1]))
+                self.db.commit()
+
+    def _fetch(self, source, key, fetch):
+        result = fetch()
+        if not isinstance(result, Fresh):
+            result = Fresh(result)
+        #no answer isn't worth keeping, ask again next time; a no-store one may not be kept
+        if result.value is not None and result.store:
+            self.put(source, key, result.value, result.ttl)
+        return result.value
+
+    def _refresh(self, source, key, fetch):
+        try:
+            self._fetch(source, key, fetch)
+        except Exception:
+            pass #keep serving the old answer, the next request will try again
+        finally:
+            with self._lock:
+                self._refreshing.discard((source, key))
+
+    def get(self, source, key, fetch):
+        '''
+        Returns the cached answer for (source, key), calling fetch() to get one when there is
+        none or it has expired. fetch returns the value, or a Fresh(value, ttl) to override the
+        source's TTL.
+        '''
+        entry = self._read(source, key)
+        now = time.time()
+        if entry is not None and now < entry[1]:
+            with self._lock:
+                self.hits += 1
+            return entry[0]
+        if entry is not None and now < entry[1] + self.stale_for:
+            with self._lock:
+                self.stale_hits += 1
+                if (source, key) in self._refreshing:
+                    return entry[0]
+                self._refreshing.add((source, key))
+            threading.Thread(target=self._refresh, args=(source, key, fetch), daemon=True).start()
+            return entry[0]
+        with self._lock:
+            self.misses += 1
+        try:
+            return self._fetch(source, key, fetch)
+        except Exception:
+            if entry is None:
+                raise
+            return entry[0] #too old to be trusted normally, but better than no answer offline
+
+    def stats(self):
+        return {'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses,
+                'memory_entries': len(self.memory)}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared():
+    '''
+    Returns the cache every lookup in the assistant goes through.
+    '''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LookupCache()
+    return _shared
+
+#========================
+#   Cached sources
+#========================
+def weather(station='KPWT'):
+    import pywapi
+    return shared().get('noaa', station, lambda: pywapi.get_weather_from_noaa(station))
+
+def feed(url):
+    '''
+    The title and description of an RSS feed, which is all the assistant reads out.
+    '''
+    def fetch():
+        import feedparser
+        d = feedparser.parse(url)
+        if d.bozo and not d.feed:
+            raise d.bozo_exception
+        headers = d.get('headers')
+        return Fresh({'title': d.feed['title'], 'description': d.feed['description']},
+                     max_age(headers), not no_store(headers))
+    return shared().get('rss', url, fetch)
+
+if __name__ == "__main__":
+    print(__about__)
+    calls = []
+    lookups = LookupCache(path=None, ttls={'demo': 0.05}, stale_for=60)
+    def fetch():
+        calls.append(time.time())
+        return 'answer %d' % len(calls)
+    for _ in range(1000):
+        lookups.get('demo', 'question', fetch)
+    time.sleep(0.1)
+    print(lookups.get('demo', 'question', fetch), '(stale, refreshing)')
+    time.sleep(0.1)
+    print(lookups.get('demo', 'question', fetch), '(refreshed)')
+    print(len(calls), 'fetches for 1002 lookups', lookups.stats())
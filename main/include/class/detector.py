@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+
+
+import cv2
+import numpy as np
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+from time import time
+
+FRONTAL_CASCADE = "../classifier/haarcascade_frontalface_default.xml"
+PROFILE_CASCADE = "../classifier/haarcascade_profileface.xml"
+
+
+
+class Detection():
+
+    # One face found at one rotation. box is (x, y, w, h) in the rotated, downscaled gray frame
+    # (face is that crop), corners are the box's four corners in original frame coordinates.
+    def __init__(self, angle, box, face, corners):
+        self.angle = angle
+        self.box = box
+        self.face = face
+        self.corners = corners
+
+    def bounding_box(self):
+        x, y = self.corners.min(axis = 0)
+        w, h = self.corners.max(axis = 0) - (x, y)
+        return int(x), int(y), int(w), int(h)
+
+class RotatedFaceDetector():
+
+    # Looks for tilted faces by running the Haar cascades on rotated copies of the frame. The
+    # frame is converted to gray and downscaled once, each angle is a cv2.warpAffine of that small
+    # gray frame with a cached rotation matrix, and the angles run at the same time on a pool of
+    # threads (OpenCV releases the GIL), each thread with its own cascades. min_size is the
+    # smallest face in original frame pixels, so downscaling doesn't raise it.
+    def __init__(self, cascades = (FRONTAL_CASCADE, PROFILE_CASCADE), scale = 0.5, threads = 3,
+                 scale_factor = 1.3, min_neighbors = 5, min_size = (30, 30)):
+        self.cascades = cascades   # tried in order, the next only when the previous found nothing
+        self.scale = scale
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self._matrices = {}
+        self._local = threading.local()
+        self._pool = ThreadPool(threads)
+
+    def _classifiers(self):
+        if not hasattr(self._local, "classifiers"):
+            self._local.classifiers = [cv2.CascadeClassifier(path) for path in self.cascades]
+        return self._local.classifiers
+
+    def rotation(self, angle, shape):
+        # The rotation of a frame of this shape by angle degrees (counter clockwise, like
+        # ndimage.rotate) onto a canvas big enough to hold all of it, and its inverse.
+        key = (angle, shape)
+        if key not in self._matrices:
+            h, w = shape
+            M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+            cos, sin = abs(M[0, 0]), abs(M[0, 1])
+            size = (int(round(h * sin + w * cos)), int(round(h * cos + w * sin)))
+            M[0, 2] += size[0] / 2.0 - w / 2.0
+            M[1, 2] += size[1] / 2.0 - h / 2.0
+            self._matrices[key] = (M, cv2.invertAffineTransform(M), size)
+        return self._matrices[key]
+
+    def prepare(self, frame):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1:
+            gray = cv2.resize(gray, None, fx = self.scale, fy = self.scale, interpolation = cv2.INTER_AREA)
+        return gray
+
+    def detect_at(self, gray, angle):
+        # Faces in the small gray frame rotated by angle, mapped back to original coordinates
+        if angle:
+            M, inverse, size = self.rotation(angle, gray.shape)
+            rotated = cv2.warpAffine(gray, M, size, flags = cv2.INTER_LINEAR)
+        else:
+            inverse, rotated = None, gray
+        min_size = tuple(int(round(side * self.scale)) for side in self.min_size)
+        faces = ()
+        for classifier in self._classifiers():
+            faces = classifier.detectMultiScale(rotated, scaleFactor = self.scale_factor,
+                                                minNeighbors = self.min_neighbors, minSize = min_size)
+            if len(faces):
+                break
+        detections = []
+        for (x, y, w, h) in faces:
+            corners = np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype = np.float64)
+            if inverse is not None:
+                corners = corners.dot(inverse[:, :2].T) + inverse[:, 2]
+            detections.append(Detection(angle, (x, y, w, h), rotated[y: y + h, x: x + w], corners / self.scale))
+        return detections
+
+    def detect(self, frame, angles = (0, -30, 30)):
+        # Runs every angle at once; returns (angle, detections) for the first angle in the given
+        # order that found a face, the same one the sequential search would stop at, or (None, []).
+        gray = self.prepare(frame)
+        results = self._pool.map(lambda angle: self.detect_at(gray, angle), list(angles))
+        for angle, detections in zip(angles, results):
+            if detections:
+                return angle, detections
+        return None, []
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+
+
+def legacy_detect(frame, classifiers, angles = (0, -30, 30)):
+
+    # The search vInter.py used to do: ndimage.rotate of the full colour frame for each angle
+    from scipy import ndimage
+    for angle in angles:
+        rotated_frame = ndimage.rotate(frame, angle)
+        gray = cv2.cvtColor(rotated_frame, cv2.COLOR_BGR2GRAY)
+        for classifier in classifiers:
+            faces = classifier.detectMultiScale(gray, scaleFactor = 1.3, minNeighbors = 5, minSize = (30, 30))
+            if len(faces):
+                return angle, faces
+    return None, []
+
+def benchmark(frames, angles = (0, -30, 30), scale = 1.0):
+
+    # Frames per second of the old and the new search over the same frames. Frames without a
+    # face are the worst case for both, since every angle is tried.
+    classifiers = [cv2.CascadeClassifier(path) for path in (FRONTAL_CASCADE, PROFILE_CASCADE)]
+    t0 = time()
+    legacy_found = sum(legacy_detect(frame, classifiers, angles)[0] is not None for frame in frames)
+    legacy = len(frames) / (time() - t0)
+
+    detector = RotatedFaceDetector(scale = scale, threads = len(angles))
+    detector.detect(frames[0], angles)   # loads the cascades in every thread
+    t0 = time()
+    found = sum(detector.detect(frame, angles)[0] is not None for frame in frames)
+    rotated = len(frames) / (time() - t0)
+    detector.close()
+
+    print ("ndimage.rotate loop:    %6.1f fps, faces in %d of %d frames" % (legacy, legacy_found, len(frames)))
+    print ("RotatedFaceDetector:    %6.1f fps, faces in %d of %d frames" % (rotated, found, len(frames)))
+    return legacy, rotated
+
+
+
+if __name__ == "__main__":
+    # python detector.py [video file or camera index], 100 frames of it; random frames without one
+    if len(sys.argv) > 1:
+        source = cv2.VideoCapture(int(sys.argv[1]) if sys.argv[1].isdigit() else sys.argv[1])
+        frames = []
+        while len(frames) < 100:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(frame)
+        source.release()
+    else:
+        rng = np.random.RandomState(0)
+        frames = [rng.randint(0, 256, (480, 640, 3)).astype(np.uint8) for _ in range(20)]
+    benchmark(frames)
@@ -18,6 +18,8 @@
 
 import cv2
 import os
+import hashlib
+import pickle
 import numpy as np
 from scipy import ndimage
 from time import time
@@ -33,6 +35,7 @@ from sklearn.metrics import classification_report
 from sklearn.metrics import confusion_matrix
 from sklearn.decomposition import RandomizedPCA
 from sklearn.svm import SVC
+import sklearn
 
 import utils as ut
 
@@ -179,6 +182,14 @@ def test_SVM(face_profile_data, face_profile_name_index, face_dim, face_profile_
     return clf, pca
 
 
+def make_SVC():
+
+    return SVC(C=1000.0, cache_size=200, class_weight='balanced', coef0=0.0,
+  decision_function_shape=None, degree=3, gamma=0.0001, kernel='rbf',
+  max_iter=-1, probability=False, random_state=None, shrinking=True,
+  tol=0.001, verbose=False)
+
+
 def build_SVC(face_profile_data, face_profile_name_index, face_dim):
 
     X = face_profile_data
@@ -212,10 +223,7 @@ def build_SVC(face_profile_data, face_profile_name_index, face_dim):
     # clf = GridSearchCV(SVC(kernel='rbf', class_weight='balanced'), param_grid)
 
     # Best Estimator found using Radial Basis Function Kernal:
-    clf = SVC(C=1000.0, cache_size=200, class_weight='balanced', coef0=0.0,
-  decision_function_shape=None, degree=3, gamma=0.0001, kernel='rbf',
-  max_iter=-1, probability=False, random_state=None, shrinking=True,
-  tol=0.001, verbose=False)
+    clf = make_SVC()
     # Train_pca with Alex Test Error Rate:  0.088424437299
     # Train_pca with Alex Test Recognition Rate:  0.911575562701
 
@@ -239,14 +247,202 @@ def build_SVC(face_profile_data, face_profile_name_index, face_dim):
     return clf, pca
 
 
+# Model bundle kept next to the face profiles, so a start with unchanged profiles
+# loads the trained PCA and SVC instead of fitting them again
+MODEL_VERSION = 3
+MODEL_FILE = "face_model.pkl"
+
+
+def profile_fingerprint(face_profile_directory):
+
+    fingerprint = {}
+    for face_profile in sorted(os.listdir(face_profile_directory)):
+        if "." in str(face_profile):
+            continue
+        face_profile_path = os.path.join(face_profile_directory, face_profile)
+        digest = hashlib.sha1()
+        for the_file in sorted(os.listdir(face_profile_path)):
+            if the_file.endswith(ut.IMAGE_EXTENSIONS):
+                stat = os.stat(os.path.join(face_profile_path, the_file))
+                digest.update(("%s %d %r\n" % (the_file, stat.st_size, stat.st_mtime)).encode("utf-8"))
+        fingerprint[face_profile] = digest.hexdigest()
+    return fingerprint
+
+
+def save_model(model_path, clf, pca, face_profile_names, fingerprint, features=None, labels=None):
+
+    bundle = {
+        "version": MODEL_VERSION,
+        "sklearn": sklearn.__version__,
+        "fingerprint": fingerprint,
+        "names": list(face_profile_names),
+        "pca": pca,
+        "clf": clf,
+        "features": features,
+        "labels": labels,
+        "created": time(),
+    }
+    tmp_path = model_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(bundle, f, 2)
+    os.rename(tmp_path, model_path)
+    return bundle
+
+
+def load_model(model_path, fingerprint=None):
+
+    if not os.path.exists(model_path):
+        return None
+    try:
+        with open(model_path, "rb") as f:
+            bundle = pickle.load(f)
+    except Exception as e:
+        print ("\nIgnoring unreadable face model " + model_path + ": " + str(e))
+        return None
+    if bundle.get("version") != MODEL_VERSION or bundle.get("sklearn") != sklearn.__version__:
+        return None
+    if fingerprint is not None and bundle.get("fingerprint") != fingerprint:
+        return None
+    return bundle
+
+
+def load_or_build_SVC(face_profile_directory, face_dim, model_path=None):
+
+    model_path = model_path or os.path.join(face_profile_directory, MODEL_FILE)
+    fingerprint = profile_fingerprint(face_profile_directory)
+    bundle = load_model(model_path, fingerprint)
+    if bundle is not None:
+        print ("\nLoaded the face model for " + str(len(bundle["names"])) + " people from " + model_path)
+        return bundle["clf"], bundle["pca"], bundle["names"]
+
+    face_profile_data, face_profile_name_index, face_profile_names = ut.load_training_data(face_profile_directory)
+    print ("\n", face_profile_name_index.shape[0], " samples from ", len(face_profile_names), " people are loaded")
+    clf, pca = build_SVC(face_profile_data, face_profile_name_index, face_dim)
+    # the profiles may have changed while loading (empty ones are deleted), so fingerprint again
+    save_model(model_path, clf, pca, face_profile_names, profile_fingerprint(face_profile_directory),
+               pca.transform(face_profile_data).astype(np.float32), face_profile_name_index)
+    return clf, pca, face_profile_names
+
+
+class CentroidClassifier(object):
+
+    def __init__(self):
+        self.sums = {}
+        self.counts = {}
+
+    def partial_fit(self, X, y):
+        for label in np.unique(y):
+            rows = X[y == label]
+            self.sums[label] = self.sums.get(label, 0) + rows.sum(axis=0, dtype=np.float64)
+            self.counts[label] = self.counts.get(label, 0) + rows.shape[0]
+        self.classes_ = np.array(sorted(self.sums))
+        self.centroids_ = np.array([self.sums[label] / self.counts[label] for label in self.classes_])
+        return self
+
+    def fit(self, X, y):
+        self.sums, self.counts = {}, {}
+        return self.partial_fit(X, y)
+
+    def decision_function(self, X):
+        X = np.atleast_2d(X)
+        distances = (X * X).sum(axis=1)[:, None] - 2 * X.dot(self.centroids_.T) + (self.centroids_ ** 2).sum(axis=1)
+        return -distances
+
+    def predict(self, X):
+        return self.classes_[self.decision_function(X).argmax(axis=1)]
+
+
+def _others(fingerprint, face_profile_name):
+
+    return dict((name, digest) for name, digest in fingerprint.items() if name != face_profile_name)
+
+
+def enroll(face_profile_directory, face_profile_name, model_path=None, mode="svc", face_dim=(50, 50)):
+
+    model_path = model_path or os.path.join(face_profile_directory, MODEL_FILE)
+    bundle = load_model(model_path)
+    # the bundle only vouches for the profiles it was trained on: if any of the others changed
+    # on disk since, adding this one to it would hide that, so train on every profile again
+    fingerprint = profile_fingerprint(face_profile_directory)
+    if bundle is None or bundle["features"] is None or \
+            _others(bundle["fingerprint"], face_profile_name) != _others(fingerprint, face_profile_name):
+        return load_or_build_SVC(face_profile_directory, face_dim, model_path)
+
+    t0 = time()
+    pca, names = bundle["pca"], list(bundle["names"])
+    features, labels = bundle["features"], bundle["labels"]
+    face_profile_path = os.path.join(face_profile_directory, face_profile_name)
+    X_new, readable = ut.read_images(ut.list_face_profile_images(face_profile_path), face_dim)
+    if not X_new.shape[0]:
+        raise ValueError("Face profile " + face_profile_path + " contains no images")
+    is_new = face_profile_name not in names
+    if not is_new:
+        # enrolling someone again replaces their old images
+        label = names.index(face_profile_name)
+        features, labels = features[labels != label], labels[labels != label]
+    else:
+        label = len(names)
+        names.append(face_profile_name)
+    new_features = pca.transform(X_new).astype(np.float32)
+    new_labels = np.empty(X_new.shape[0], dtype = labels.dtype)
+    new_labels.fill(label)
+    features = np.concatenate((features, new_features), axis=0)
+    labels = np.concatenate((labels, new_labels))
+
+    clf = bundle["clf"]
+    if mode == "centroid":
+        if isinstance(clf, CentroidClassifier) and is_new:
+            clf = clf.partial_fit(new_features, new_labels)
+        else:
+            clf = CentroidClassifier().fit(features, labels)
+    else:
+        clf = make_SVC().fit(features, labels)
+    save_model(model_path, clf, pca, names, fingerprint, features, labels)
+    print ("\nEnrolled " + face_profile_name + " (" + str(X_new.shape[0]) + " images, " + mode + ") in %0.2f s" % (time() - t0))
+    return clf, pca, names
+
+
 def predict(clf, pca, img, face_profile_names):
 
-    img = img.ravel()
-    # Apply dimentionality reduction on img, img is projected on the first principal components previous extracted from the Yale Extended dataset B.
-    principle_components = pca.transform(img[0])
-    pred = clf.predict(principle_components)[0]
-    name = face_profile_names[pred]
-    return name
+    return predict_batch(clf, pca, [img], face_profile_names)[0][0]
+
+
+def class_scores(clf, decision):
+
+    decision = np.asarray(decision, dtype=np.float64)
+    n_classes = len(clf.classes_)
+    if decision.ndim == 1:
+        # two classes: one signed distance, positive for the second class
+        return np.column_stack((-decision, decision))
+    shape = getattr(clf, "decision_function_shape", "ovr")
+    if shape is None:
+        # None meant one-vs-one until scikit-learn 0.19
+        shape = "ovo" if tuple(int(v) for v in sklearn.__version__.split(".")[:2]) < (0, 19) else "ovr"
+    if shape != "ovo" and decision.shape[1] == n_classes:
+        return decision
+    # one-vs-one: column k compares the k-th pair (i, j), i < j, positive votes for i
+    votes = np.zeros((decision.shape[0], n_classes))
+    k = 0
+    for i in range(n_classes):
+        for j in range(i + 1, n_classes):
+            votes[:, i] += decision[:, k] > 0
+            votes[:, j] += decision[:, k] <= 0
+            k += 1
+    return votes
+
+
+def predict_batch(clf, pca, faces, face_profile_names):
+
+    if not len(faces):
+        return [], np.empty(0)
+    X = np.asarray([np.ravel(face) for face in faces])
+    scores = class_scores(clf, clf.decision_function(pca.transform(X)))
+    best = scores.argmax(axis=1)
+    ranked = np.sort(scores, axis=1)
+    confidences = ranked[:, -1] - ranked[:, -2] if scores.shape[1] > 1 else np.zeros(len(X))
+    names = [face_profile_names[label] for label in clf.classes_[best]]
+    return names, confidences
+
 
 def errorRate(pred, actual):
 
@@ -25,27 +25,50 @@ import errno
 import sys
 import logging
 import shutil
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 
 
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".pgm")
+
+def list_face_profile_images(face_profile):
+
+    return [os.path.join(face_profile, the_file) for the_file in sorted(os.listdir(face_profile))
+            if the_file.endswith(IMAGE_EXTENSIONS)]
+
+def read_images(file_paths, dim = (50, 50), threads = None):
+
+    X_data = np.empty((len(file_paths), dim[0] * dim[1]), dtype = np.uint8)
+    readable = np.ones(len(file_paths), dtype = bool)
+
+    def read(i):
+        img = cv2.imread(file_paths[i], 0)
+        if img is None:
+            readable[i] = False
+            logging.error("\nCould not read image " + str(file_paths[i]))
+            return
+        X_data[i] = cv2.resize(img, dim, interpolation = cv2.INTER_AREA).ravel()
+
+    pool = ThreadPool(threads or cpu_count())
+    try:
+        pool.map(read, range(len(file_paths)))
+    finally:
+        pool.close()
+        pool.join()
+    if not readable.all():
+        X_data = X_data[readable]
+    return X_data, readable
+
 def read_images_from_single_face_profile(face_profile, face_profile_name_index, dim = (50, 50)):
 
-    X_data = np.array([])
-    index = 0
-    for the_file in os.listdir(face_profile):
-        file_path = os.path.join(face_profile, the_file)
-        if file_path.endswith(".png") or file_path.endswith(".jpg") or file_path.endswith(".jpeg") or file_path.endswith(".pgm"):
-            img = cv2.imread(file_path, 0)
-            img = cv2.resize(img, dim, interpolation = cv2.INTER_AREA)
-            img_data = img.ravel()
-            X_data = img_data if not X_data.shape[0] else np.vstack((X_data,img_data))
-            index += 1
-
-    if index == 0 :
+    file_paths = list_face_profile_images(face_profile)
+    if not file_paths:
         shutil.rmtree(face_profile)
         logging.error("\nThere exists face profiles without images")
 
-    Y_data = np.empty(index, dtype = int)
+    X_data, readable = read_images(file_paths, dim)
+    Y_data = np.empty(X_data.shape[0], dtype = int)
     Y_data.fill(face_profile_name_index)
     return X_data, Y_data
 
@@ -77,20 +100,17 @@ def load_training_data(face_profile_directory):
         logging.error("\nFace profile contains too little profiles (At least 2 profiles are needed)")
         exit()
 
-    first_data = str(face_profile_names[0])
-    first_data_path = os.path.join(face_profile_directory, first_data)
-    X1, y1 = read_images_from_single_face_profile(first_data_path, 0)
-    X_data = X1
-    Y_data = y1
+    # List every image first, so all of them are read into one array in one go
+    profile_paths = [os.path.join(face_profile_directory, str(name)) for name in face_profile_names]
+    profile_files = [list_face_profile_images(path) for path in profile_paths]
+    file_paths = [file_path for files in profile_files for file_path in files]
+    Y_data = np.repeat(np.arange(len(profile_files)), [len(files) for files in profile_files])
+    X_data, readable = read_images(file_paths)
+    Y_data = Y_data[readable]
+
     print ("Loading Database: ")
-    print (0, "    ",X1.shape[0]," images are loaded from:", first_data_path)
-    for i in range(1, len(face_profile_names)):
-        directory_name = str(face_profile_names[i])
-        directory_path = os.path.join(face_profile_directory, directory_name)
-        tempX, tempY = read_images_from_single_face_profile(directory_path, i)
-        X_data = np.concatenate((X_data, tempX), axis=0)
-        Y_data = np.append(Y_data, tempY)
-        print (i, "    ",tempX.shape[0]," images are loaded from:", directory_path)
+    for i, path in enumerate(profile_paths):
+        print (i, "    ", np.count_nonzero(Y_data == i), " images are loaded from:", path)
 
     return X_data, Y_data, face_profile_names
 
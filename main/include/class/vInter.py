@@ -20,27 +20,32 @@ sys.path.append('./class')
 import cv2
 import os
 import numpy as np
-from scipy import ndimage
 from time import time
 import matplotlib.pyplot as plt
 import utils as ut
 #Support Vector Machine
 import svm
+from detector import RotatedFaceDetector
 
 import logging
 import warnings
 
+# The assistant's message bus, lives in include/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bus
+try:
+    identities = bus.connect()
+except OSError:
+    identities = None
+    print("Assistant not running, recognized faces won't be reported")
+last_identity = None
+
 # Building SVC from database
 
 FACE_DIM = (50,50) # h = 50, w = 50
 
-# Load training data from face_profiles/
-face_profile_data, face_profile_name_index, face_profile_names  = ut.load_training_data("/PARAGON/main/Data/Databases/face_profiles/")
-
-print("\n", face_profile_name_index.shape[0], " samples from ", len(face_profile_names), " people are loaded")
-
-# Build the classifier
-clf, pca = svm.build_SVC(face_profile_data, face_profile_name_index, FACE_DIM)
+# Load the classifier trained on face_profiles/, training it first if the profiles changed
+clf, pca, face_profile_names = svm.load_or_build_SVC("/PARAGON/main/Data/Databases/face_profiles/", FACE_DIM)
 
 
 
@@ -48,8 +53,6 @@ DISPLAY_FACE_DIM = (600, 600) # the displayed video stream screen dimension
 SKIP_FRAME = 2      # the fixed skip frame
 frame_skip_rate = 0 # skip SKIP_FRAME frames every other frame
 SCALE_FACTOR = 1 # used to resize the captured frame for face detection for faster processing speed
-face_cascade = cv2.CascadeClassifier("../classifier/haarcascade_frontalface_default.xml") #create a cascade classifier
-sideFace_cascade = cv2.CascadeClassifier('../classifier/haarcascade_profileface.xml')
 
 if len(sys.argv) == 2:
     SCALE_FACTOR = float(sys.argv[1])
@@ -57,6 +60,9 @@ if len(sys.argv) == 2:
 elif len(sys.argv) >2:
     logging.error("main.py ")
 
+#Haar cascades on rotated copies of the frame, for tilted heads
+detector = RotatedFaceDetector(scale = 1.0 / SCALE_FACTOR)
+
 # dictionary mapping used to keep track of head rotation maps
 rotation_maps = {
 
@@ -77,7 +83,6 @@ current_rotation_map = get_rotation_map(0)
 webcam = cv2.VideoCapture(0)
 
 ret, frame = webcam.read() # get first frame
-frame_scale = (frame.shape[1]/SCALE_FACTOR,frame.shape[0]/SCALE_FACTOR)  # (y, x)
 
 cropped_face = []
 num_of_face_saved = 0
@@ -88,74 +93,42 @@ while ret:
     #Exit on 'q' 'esc' 'Q'
     if key in [27, ord('Q'), ord('q')]:
         break
-    #Resize the captured frame for face detection to increase processing speed
-    resized_frame = frame
-
-    processed_frame = resized_frame
+    processed_frame = frame
     #Skip a frame if the no face was found last frame
 
     if frame_skip_rate == 0:
-        faceFound = False
-        for rotation in current_rotation_map:
-
-            rotated_frame = ndimage.rotate(resized_frame, rotation)
-
-            gray = cv2.cvtColor(rotated_frame, cv2.COLOR_BGR2GRAY)
+        #Every angle of the rotation map is searched at once, on a small gray copy of the frame
+        rotation, detections = detector.detect(frame, current_rotation_map)
+        faceFound = rotation is not None
 
-            #Return tuple is empty, ndarray if detected face
-            faces = face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.3,
-                minNeighbors=5,
-                minSize=(30, 30)
-               # flags=cv2.CV_HAAR_SCALE_IMAGE
-            )
-
-            # If frontal face detector failed, use profileface detector
-            faces = faces if len(faces) else sideFace_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.3,
-                minNeighbors=5,
-                minSize=(30, 30),
-                #flags=cv2.cv.CV_HAAR_SCALE_IMAGE
-            )
-
-    
-            if len(faces):
-                for f in faces:
-                    x, y, w, h = [ v for v in f ] # scale the bounding box back to original frame size
-                    cropped_face = rotated_frame[y: y + h, x: x + w]   # img[y: y + h, x: x + w]
-                    cropped_face = cv2.resize(cropped_face, DISPLAY_FACE_DIM, interpolation = cv2.INTER_AREA)
-
-                    #Crop out and prepare to display on camera
-                    face_to_predict = cv2.resize(cropped_face, FACE_DIM, interpolation = cv2.INTER_AREA)
-                    face_to_predict = cv2.cvtColor(face_to_predict, cv2.COLOR_BGR2GRAY)
-                    name_to_display = svm.predict(clf, pca, face_to_predict, face_profile_names)
-
-                    # Display frame
-                    cv2.rectangle(rotated_frame, (x,y), (x+w,y+h), (255,255,0))
-                    cv2.putText(rotated_frame, name_to_display, (x,y), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0))
-
-                # rotate the frame back and trim the black paddings
-                processed_frame = ut.trim(ut.rotate_image(rotated_frame, rotation * (-1)), frame_scale)
-
-                # reset the optmized rotation map
-                current_rotation_map = get_rotation_map(rotation)
+        if faceFound:
+            #Identify every face in one batch
+            faces_to_predict = [cv2.resize(d.face, FACE_DIM, interpolation = cv2.INTER_AREA) for d in detections]
+            names, confidences = svm.predict_batch(clf, pca, faces_to_predict, face_profile_names)
 
-                faceFound = True
+            #The last face is the one displayed on its own
+            cropped_face = cv2.resize(detections[-1].face, DISPLAY_FACE_DIM, interpolation = cv2.INTER_AREA)
 
+            for d, name_to_display in zip(detections, names):
+                # Display frame, the box drawn tilted the way the face was found
+                cv2.polylines(processed_frame, [d.corners.astype(np.int32)], True, (255,255,0))
+                x, y = d.corners[0].astype(int)
+                cv2.putText(processed_frame, name_to_display, (x,y), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0))
 
-                break
+            # reset the optmized rotation map
+            current_rotation_map = get_rotation_map(rotation)
 
         if faceFound:
             frame_skip_rate = 0
             # print "Face Found"
-            print(name_to_display)
-            if name_to_display == "travis":
-                import json
-                with open('/PARAGON/main/Data/Databases/Data/data.json', 'w') as outfile:
-                    data = {'Identity':[{'nameFirst': name_to_display}]}
-                    json.dump(data, outfile)
+            print(", ".join(names))
+            if identities is not None and "travis" in names and last_identity != "travis":
+                #Tell the assistant who it is talking to
+                try:
+                    identities.publish(bus.IDENTITY, {'nameFirst': "travis"})
+                    last_identity = "travis"
+                except OSError:
+                    pass
 
         else:
             frame_skip_rate = SKIP_FRAME
@@ -176,7 +149,7 @@ while ret:
 
 
     if len(cropped_face):
-        cv2.imshow("Cropped Face", cv2.cvtColor(cropped_face, cv2.COLOR_BGR2GRAY))
+        cv2.imshow("Cropped Face", cropped_face)
         # face_to_predict = cv2.resize(cropped_face, FACE_DIM, interpolation = cv2.INTER_AREA)
         # face_to_predict = cv2.cvtColor(face_to_predict, cv2.COLOR_BGR2GRAY)
         # name_to_display = svm.predict(clf, pca, face_to_predict, face_profile_names)
@@ -185,4 +158,5 @@ while ret:
 
 
 webcam.release()
+detector.close()
 cv2.destroyAllWindows()
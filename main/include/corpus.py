@@ -0,0 +1,309 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  TRAINING CORPUS WRITER
+******************************************
+'''
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+#========================
+#   On disk
+#========================
+#A corpus is a directory of append-only text files, one sentence per line: out.txt first (what
+#the seq2seq scripts always read), then out.0001.txt, out.0002.txt, ... as each one fills up.
+#corpus.json is the manifest: for every file the global number of its first line, its line
+#count and how many of its bytes are complete. Readers only trust what the manifest lists, so
+#they never see half a write, and can pick up from any (file, offset) they stopped at.
+MANIFEST = 'corpus.json'
+HASHES = 'corpus.hashes'  #8 byte digest of every line, in order, for deduplication
+LOCK = 'corpus.lock'
+MANIFEST_VERSION = 1
+MAX_BYTES = 64 * 1024 * 1024
+
+_ROTATED = r'^%s\.(\d+)\.txt$'  #with the re.escape()d name of the first file, e.g. out
+
+def digest(line):
+    return hashlib.blake2b(line, digest_size=8).digest()
+
+def read_manifest(directory):
+    '''
+    Returns the manifest of a corpus directory, or None if it has none yet.
+    '''
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+class CorpusWriter():
+
+    '''
+    Appends labelled sentences to one corpus directory. Empty sentences and ones already in the
+    corpus (by hash) are skipped, so the same utterance heard twice is stored once, and once the
+    current file passes max_bytes the next sentence starts a new one. Nothing already written is
+    ever rewritten: an append is a buffered write, and flush() adds the new digests to the hash
+    file and replaces the small manifest.
+
+    Only one writer may have a corpus open at a time; a second one raises BlockingIOError.
+    '''
+    def __init__(self, directory, name='out', max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = open(os.path.join(directory, LOCK), 'a')
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock.close()
+            raise
+        self.added = self.skipped = 0
+        self.files = []
+        self.seen = set()
+        self._new_digests = []
+        self._recover()
+        self._file = open(self._path(self.files[-1]['name']), 'ab')
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _scan(self, entry, start=0, committed=None):
+        #counts and hashes the complete lines of a file from byte start on. An unterminated last
+        #line past the committed offset the manifest recorded is a write torn by a crash and is
+        #cut off; without a manifest (a file from before this writer) it is a real sentence that
+        #just lacks its newline, so the newline is added instead
+        path = self._path(entry['name'])
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            end = start
+            tail = b''
+            for line in f:
+                if not line.endswith(b'\n'):
+                    tail = line
+                    break
+                end += len(line)
+                entry['lines'] += 1
+                self.seen.add(digest(line.rstrip(b'\n')))
+        if tail and committed is None:
+            with open(path, 'ab') as f:
+                f.write(b'\n')
+            end += len(tail) + 1
+            entry['lines'] += 1
+            self.seen.add(digest(tail))
+        elif tail:
+            os.truncate(path, max(end, committed))
+        entry['bytes'] = end
+
+    def _segments(self):
+        #rotated files on disk, by number
+        pattern = re.compile(_ROTATED % re.escape(self.name))
+        found = ((pattern.match(n), n) for n in os.listdir(self.directory))
+        return sorted((int(m.group(1)), n) for m, n in found if m)
+
+    def _recover(self):
+        '''
+        Loads the manifest and hashes, catching up on anything written after the last flush,
+        including files rotated into since. Without a manifest (an old corpus, or a new one)
+        every file is scanned once.
+        '''
+        manifest = read_manifest(self.directory)
+        if manifest is not None:
+            self.files = manifest['files']
+            hashes = self._path(HASHES)
+            data = b''
+            if os.path.exists(hashes):
+                with open(hashes, 'rb') as f:
+                    data = f.read()
+            total = sum(entry['lines'] for entry in self.files)
+            if len(data) >= 8 * total:
+                self.seen.update(data[i:i + 8] for i in range(0, 8 * total, 8))
+                last = self.files[-1]
+                counted = total
+                self._scan(last, last['bytes'], last['bytes'])
+                #segments rotated into after the last flush, which the manifest doesn't list yet
+                listed = set(entry['name'] for entry in self.files)
+                last_number = max([n for n, name in self._segments() if name in listed] or [0])
+                for number, name in self._segments():
+                    if number > last_number and name not in listed:
+                        last = self.files[-1]
+                        entry = {'name': name, 'first_line': last['first_line'] + last['lines'], 'lines': 0, 'bytes': 0}
+                        self._scan(entry, 0, 0)
+                        self.files.append(entry)
+                #lines written after the last flush still need their digests stored
+                self._rewrite_hashes = len(data) != 8 * total or self.lines != counted
+                return
+        names = [self.name + '.txt'] + [name for _, name in self._segments()]
+        recorded = dict((entry['name'], entry['bytes']) for entry in manifest['files']) if manifest else {}
+        self.files, self.seen, first = [], set(), 0
+        for name in names:
+            entry = {'name': name, 'first_line': first, 'lines': 0, 'bytes': 0}
+            self._scan(entry, 0, recorded.get(name))
+            self.files.append(entry)
+            first += entry['lines']
+        self._rewrite_hashes = True
+
+    def _rotate(self):
+        self._file.close()
+        last = self.files[-1]
+        #numbered after every segment on disk too, so a file the manifest lost is never reused
+        numbers = [number for number, _ in self._segments()] + [len(self.files) - 1]
+        name = '%s.%04d.txt' % (self.name, max(numbers) + 1)
+        self.files.append({'name': name, 'first_line': last['first_line'] + last['lines'], 'lines': 0, 'bytes': 0})
+        self._file = open(self._path(name), 'ab')
+
+    def append(self, sentence):
+        '''
+        Adds one sentence; returns False if it was empty or already in the corpus.
+        '''
+        line = ' '.join(sentence.split()).encode('utf-8')
+        key = digest(line)
+        if not line or key in self.seen:
+            self.skipped += 1
+            return False
+        last = self.files[-1]
+        if last['bytes'] and last['bytes'] + len(line) + 1 > self.max_bytes:
+            self._rotate()
+            last = self.files[-1]
+        self._file.write(line + b'\n')
+        last['lines'] += 1
+        last['bytes'] += len(line) + 1
+        self.seen.add(key)
+        self._new_digests.append(key)
+        self.added += 1
+        return True
+
+    def extend(self, sentences):
+        return sum(self.append(sentence) for sentence in sentences)
+
+    @property
+    def lines(self):
+        return sum(entry['lines'] for entry in self.files)
+
+    def flush(self):
+        '''
+        Makes everything appended so far durable and visible to readers.
+        '''
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._rewrite_hashes:
+            #the hash file is behind the corpus (first run, or a crash): write it out in file order
+            digests = []
+            for entry in self.files:
+                with open(self._path(entry['name']), 'rb') as f:
+                    digests.extend(digest(line.rstrip(b'\n')) for line in f)
+            self._write_atomic(HASHES, b''.join(digests))
+            self._rewrite_hashes = False
+        elif self._new_digests:
+            with open(self._path(HASHES), 'ab') as f:
+                f.write(b''.join(self._new_digests))
+        self._new_digests = []
+        manifest = {'version': MANIFEST_VERSION, 'updated': time.time(), 'files': self.files}
+        self._write_atomic(MANIFEST, json.dumps(manifest, indent=1).encode('utf-8'))
+
+    def _write_atomic(self, name, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=name + '.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(name))
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        fcntl.flock(self._lock, fcntl.LOCK_UN)
+        self._lock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def new_lines(directory, cursor=None):
+    '''
+    Yields (line, cursor) for every line the manifest lists after cursor, where cursor is the
+    {'file', 'offset', 'line'} position after that line. Pass the last cursor back in to
+    continue from there; None starts at the beginning.
+    '''
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return
+    cursor = cursor or {'file': manifest['files'][0]['name'], 'offset': 0, 'line': 0}
+    names = [entry['name'] for entry in manifest['files']]
+    start = names.index(cursor['file']) if cursor['file'] in names else 0
+    line_number = cursor['line']
+    for entry in manifest['files'][start:]:
+        offset = cursor['offset'] if entry['name'] == cursor['file'] else 0
+        with open(os.path.join(directory, entry['name']), 'rb') as f:
+            f.seek(offset)
+            while offset < entry['bytes']:
+                line = f.readline()
+                offset += len(line)
+                line_number += 1
+                yield line.rstrip(b'\n').decode('utf-8'), {'file': entry['name'], 'offset': offset, 'line': line_number}
+
+def append_new_lines(directory, data_path, cursor_path=None):
+    '''
+    Appends the corpus lines not yet copied to data_path (a seq2seq training file) to it, and
+    returns how many there were. The position reached is kept in cursor_path, data_path +
+    '.cursor' by default, and only saved once the lines are written.
+    '''
+    cursor_path = cursor_path or data_path + '.cursor'
+    cursor = None
+    if os.path.exists(cursor_path):
+        with open(cursor_path, encoding='utf-8') as f:
+            cursor = json.load(f)
+    count = 0
+    with open(data_path, 'ab') as data:
+        for line, cursor in new_lines(directory, cursor):
+            data.write(line.encode('utf-8') + b'\n')
+            count += 1
+    if count:
+        with open(cursor_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(cursor, f)
+        os.replace(cursor_path + '.tmp', cursor_path)
+    return count
+
+if __name__ == "__main__":
+    print(__about__)
+    directory = tempfile.mkdtemp(prefix='corpus-demo-')
+    t0 = time.time()
+    with CorpusWriter(directory, max_bytes=256 * 1024) as writer:
+        for i in range(100000):
+            writer.append('sentence number %d' % (i % 80000))
+            if i % 1000 == 0:
+                writer.flush()
+    print("100000 appends (%d new, %d duplicates) in %0.2f s across %d files" %
+          (writer.added, writer.skipped, time.time() - t0, len(writer.files)))
+    cursor = None
+    for line, cursor in new_lines(directory):
+        pass
+    with CorpusWriter(directory, max_bytes=256 * 1024) as writer:
+        writer.extend(['sentence number 5', 'a new sentence', 'another new one'])
+    print("picked up after restart:", [line for line, _ in new_lines(directory, cursor)])
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  DEFINITION SERVICE
+******************************************
+'''
+import re
+import threading
+import time
+from collections import OrderedDict
+
+#"what is a dog", "what is an apple" -> the word being asked about
+QUESTION = re.compile(r'^.*?\bwhat is (?:an?|the)\s+', re.IGNORECASE)
+
+def subject(message):
+    return QUESTION.sub('', message).strip(' ?.!')
+
+class DefinitionService():
+
+    '''
+    Answers "what is a ..." questions from WordNet. The corpus is loaded once, on a background
+    thread started at startup, and every resolved word is kept in an LRU so asking again is a
+    dict lookup. Each answer lists every sense of the word with its gloss.
+    '''
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.wordnet = None
+        self.load_time = None
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        '''
+        Starts loading WordNet in the background. Safe to call more than once.
+        '''
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='wordnet-load', daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        t0 = time.time()
+        try:
+            from nltk.corpus import wordnet
+            wordnet.ensure_loaded()
+            wordnet.synsets('warm') #touches the lemma index and the data files once
+            self.wordnet = wordnet
+        finally:
+            self.load_time = time.time() - t0
+            self._loaded.set()
+
+    def ready(self, timeout=None):
+        return self._loaded.wait(timeout)
+
+    def define(self, word):
+        '''
+        Returns a list of (sense, part of speech, gloss) for every sense of the word, most
+        common first. Empty if WordNet doesn't know the word.
+        '''
+        key = word.lower().strip().replace(' ', '_')
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        self.start()
+        self._loaded.wait()
+        if self.wordnet is None:
+            raise ImportError("WordNet could not be loaded, try nltk.download('wordnet')")
+        senses = [(synset.name(), synset.pos(), synset.definition()) for synset in self.wordnet.synsets(key)]
+        with self._lock:
+            self.entries[key] = senses
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return senses
+
+    def define_batch(self, words):
+        '''
+        Defines several words at once; returns a dict of word -> senses.
+        '''
+        return OrderedDict((word, self.define(word)) for word in words)
+
+_service = None
+_service_lock = threading.Lock()
+
+def service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = DefinitionService()
+    return _service
+
+if __name__ == "__main__":
+    print(__about__)
+    definitions = service().start()
+    definitions.ready()
+    print("WordNet loaded in %0.3f s" % definitions.load_time)
+    for word, senses in definitions.define_batch(['dog', 'bank', 'python']).items():
+        t0 = time.time()
+        definitions.define(word)
+        print("%s (%d senses, cached lookup %0.1f us)" % (word, len(senses), (time.time() - t0) * 1e6))
+        for name, pos, gloss in senses[:3]:
+            print("    %s: %s" % (name, gloss))
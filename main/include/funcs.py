@@ -42,7 +42,7 @@ def gsearch(name):
 #search arxiv for papers
 def search(name):
 
-    import urllib
+    import urllib.request
     import feedparser
 
     # Base api query url
@@ -65,8 +65,9 @@ def search(name):
     feedparser._FeedParserMixin.namespaces['http://a9.com/-/spec/opensearch/1.1/'] = 'opensearch'
     feedparser._FeedParserMixin.namespaces['http://arxiv.org/schemas/atom'] = 'arxiv'
 
-    # perform a GET request using the base_url and query
-    response = urllib.request.urlopen(base_url+query).read()
+    # perform a GET request using the base_url and query, unless the same search was made recently
+    import cache
+    response = cache.shared().get('arxiv', query, lambda: urllib.request.urlopen(base_url+query).read())
 
     # parse the response using feedparser
     feed = feedparser.parse(response)
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  INTENT ROUTER
+******************************************
+'''
+import itertools
+import os
+import re
+import time
+
+#========================
+#   Intent table
+#========================
+#Every intent the assistant understands. A message matches an intent if it contains any of
+#its phrases (or, for exact intents, is exactly one of them). When several intents match,
+#the highest priority wins, then the longest matching phrase.
+ASSISTANT_INTENTS = [
+    {'name': 'chrome', 'priority': 100, 'phrases': ['chrome-func']},
+    {'name': 'medical', 'priority': 60, 'phrases': ['medical']},
+    {'name': 'connected', 'priority': 50, 'phrases': ['are we connected']},
+    {'name': 'time', 'priority': 50, 'phrases': ['what is the time', 'what time is it',
+        'can you get me the current time', 'can you tell me the time']},
+    {'name': 'date', 'priority': 50, 'phrases': ['what day is it', 'what is the date', 'date please']},
+    {'name': 'weather', 'priority': 50, 'phrases': ['athena can you get me the weather',
+        'can you get the weather', 'athena weather please', 'weather please']},
+    {'name': 'news', 'priority': 50, 'phrases': ['can you get the news', 'get the news please',
+        'athena get the news please']},
+    {'name': 'where', 'priority': 40, 'phrases': ['where is']},
+    {'name': 'define', 'priority': 40, 'phrases': ['what is a', 'what is an']},
+    {'name': 'athena', 'priority': 20, 'phrases': ['athena'], 'exact': True},
+    {'name': 'goodbye', 'priority': 10, 'phrases': ['goodbye']},
+    {'name': 'evening', 'priority': 10, 'phrases': ['evening']},
+    {'name': 'morning', 'priority': 10, 'phrases': ['morning']},
+]
+
+class IntentRouter():
+
+    '''
+    Compiles an intent table into one regular expression: every phrase goes into a character
+    trie, written out as nested groups, so a single scan of the message (in C) reports the
+    longest phrase starting at each position. The phrases that are prefixes of that one are
+    worked out ahead of time, so the best intent is known from the few positions where a
+    phrase starts, however many intents there are. The table stays the one place intents are
+    declared.
+    '''
+    def __init__(self, intents=ASSISTANT_INTENTS):
+        self.exact = {}
+        phrases = {}
+        for order, intent in enumerate(intents):
+            for phrase in intent['phrases']:
+                table = self.exact if intent.get('exact', False) else phrases
+                key = (intent.get('priority', 0), len(phrase), -order)
+                if phrase not in table or table[phrase][0] < key:
+                    table[phrase] = (key, intent['name'])
+        #every (key, intent) found when a phrase is the longest one starting somewhere: its own
+        #and those of the phrases it starts with, best first
+        self._found = {phrase: sorted((phrases[phrase[:n]] for n in range(1, len(phrase) + 1)
+                                       if phrase[:n] in phrases), reverse=True)
+                       for phrase in phrases}
+        self._pattern = re.compile('(?=(%s))' % self._trie(sorted(phrases))) if phrases else None
+
+    @classmethod
+    def _trie(cls, phrases):
+        #a regular expression matching the longest of the (sorted) phrases at a position
+        branches, ends_here = [], False
+        for char, group in itertools.groupby(phrases, key=lambda phrase: phrase[:1]):
+            group = [phrase[1:] for phrase in group]
+            if not char:
+                ends_here = True
+                continue
+            prefix = os.path.commonprefix(group)
+            rest = cls._trie([phrase[len(prefix):] for phrase in group])
+            branches.append(re.escape(char + prefix) + rest)
+        if not branches:
+            return ''
+        if len(branches) > 1:
+            body = '(?:%s)' % '|'.join(branches)
+        else:
+            body = '(?:%s)' % branches[0] if ends_here else branches[0]
+        return body + '?' if ends_here else body
+
+    def _scan(self, message):
+        found = []
+        if self._pattern is not None:
+            for m in self._pattern.finditer(message):
+                found.extend(self._found[m.group(1)])
+        if message in self.exact:
+            found.append(self.exact[message])
+        return found
+
+    def matches(self, message):
+        '''
+        Returns every (intent, phrase length) found in the message, best first.
+        '''
+        best, seen = [], set()
+        for key, name in sorted(self._scan(message), reverse=True):
+            if name not in seen:
+                seen.add(name)
+                best.append((name, key[1]))
+        return best
+
+    def match(self, message):
+        '''
+        Returns the name of the best intent for the message, or None if nothing matched.
+        '''
+        found = self._scan(message)
+        return max(found)[1] if found else None
+
+def benchmark(sizes=(10, 100, 1000), repeat=2000):
+    '''
+    Times dispatch through the router against a chain of "if phrase in message" checks as the
+    number of intents grows.
+    '''
+    message = 'athena could you please tell me something about the weather on mars'
+    print("%8s %16s %16s" % ("intents", "router (us/msg)", "if-chain (us/msg)"))
+    for size in sizes:
+        intents = [{'name': 'intent%d' % i, 'priority': i % 5,
+                    'phrases': ['phrase number %d' % i, 'other wording %d' % i]} for i in range(size)]
+        router = IntentRouter(intents)
+        phrases = [(intent['name'], phrase) for intent in intents for phrase in intent['phrases']]
+
+        t0 = time.time()
+        for _ in range(repeat):
+            router.match(message)
+        routed = (time.time() - t0) / repeat * 1e6
+
+        t0 = time.time()
+        for _ in range(repeat):
+            for name, phrase in phrases:
+                if phrase in message:
+                    break
+        chained = (time.time() - t0) / repeat * 1e6
+        print("%8d %16.2f %16.2f" % (size, routed, chained))
+
+if __name__ == "__main__":
+    print(__about__)
+    benchmark()
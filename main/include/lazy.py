@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  LAZY MODULE LOADER
+******************************************
+'''
+import importlib
+import threading
+import time
+import types
+from collections import OrderedDict
+
+class LazyModule(types.ModuleType):
+
+    '''
+    Stands in for a module until one of its attributes is used, then imports it through the
+    registry and forwards everything to the real module.
+    '''
+    def __init__(self, name, registry):
+        super().__init__(name)
+        self._registry = registry
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') and attr.endswith('__'):
+            raise AttributeError(attr)
+        return getattr(self._registry.load(self.__name__), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__name__ in self._registry.timings else 'not loaded'
+        return "<lazy module '%s' (%s)>" % (self.__name__, state)
+
+class ImportRegistry():
+
+    '''
+    Keeps track of the heavy modules the assistant may need, imports each one the first time it
+    is actually used, and records how long every import took.
+    '''
+    def __init__(self):
+        self.modules = OrderedDict()
+        self.timings = OrderedDict()
+        self.errors = {}
+        self.started = time.time()
+        self._lock = threading.RLock()
+
+    def lazy(self, name):
+        '''
+        Registers a module and returns a placeholder that imports it on first use.
+        '''
+        if name not in self.modules:
+            self.modules[name] = LazyModule(name, self)
+        return self.modules[name]
+
+    def load(self, name):
+        #One import at a time, so the warm-up thread and a handler never time the same import twice.
+        with self._lock:
+            if name in self.errors:
+                raise self.errors[name]
+            t0 = time.time()
+            try:
+                module = importlib.import_module(name)
+            except ImportError as e:
+                self.errors[name] = e
+                raise
+            if name not in self.timings:
+                self.timings[name] = time.time() - t0
+            return module
+
+    def warm_up(self, names, background=True, done=None):
+        '''
+        Imports the given modules ahead of time, by default on a daemon thread so the prompt
+        isn't held up. Modules that fail to import are skipped; using them raises later.
+        done, if given, is called once every module has been tried.
+        '''
+        def run():
+            for name in names:
+                try:
+                    self.load(name)
+                except Exception:
+                    pass
+            if done is not None:
+                done()
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='import-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        '''
+        Returns a table of import times, slowest first.
+        '''
+        lines = ["[System] Startup took %0.3f s" % (time.time() - self.started)]
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            lines.append("    %-24s %8.3f s" % (name, seconds))
+        for name in self.modules:
+            if name in self.errors:
+                lines.append("    %-24s   failed (%s)" % (name, self.errors[name]))
+            elif name not in self.timings:
+                lines.append("    %-24s   not loaded yet" % name)
+        return '\n'.join(lines)
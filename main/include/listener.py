@@ -0,0 +1,329 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  SPEECH CAPTURE PIPELINE
+******************************************
+'''
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+class Segment():
+
+    '''
+    One utterance cut out of the microphone stream: mono int16 PCM bytes.
+    '''
+    def __init__(self, pcm, sample_rate, started, ended):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.started = started
+        self.ended = ended
+
+    def duration(self):
+        return len(self.pcm) / 2.0 / self.sample_rate
+
+class EnergySegmenter():
+
+    '''
+    Energy based voice activity detection. The first frames calibrate the noise floor (once,
+    instead of adjust_for_ambient_noise every turn) and the floor keeps adapting during silence.
+    Speech starts after start_frames loud frames in a row and ends after silence_ms of quiet;
+    pre_roll_ms of audio from before the start is kept so the first syllable isn't clipped.
+    '''
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, ratio=3.0, min_energy=300,
+                 calibration_ms=500, start_frames=3, silence_ms=600, pre_roll_ms=300, max_segment_sec=15):
+        self.sample_rate = sample_rate
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.calibration_frames = max(1, calibration_ms // frame_ms)
+        self.start_frames = start_frames
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.max_frames = int(max_segment_sec * 1000 // frame_ms)
+        self.pre_roll = deque(maxlen=max(start_frames, pre_roll_ms // frame_ms))
+        self.floor = None
+        self._calibration = []
+        self._frames = []
+        self._voiced = 0
+        self._quiet = 0
+        self._started = None
+
+    @staticmethod
+    def energy(frame):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+    def threshold(self):
+        return max(self.min_energy, self.floor * self.ratio)
+
+    def feed(self, frame):
+        '''
+        Takes the next frame of PCM; returns a finished Segment when an utterance ends.
+        '''
+        energy = self.energy(frame)
+        if self.floor is None:
+            self._calibration.append(energy)
+            if len(self._calibration) >= self.calibration_frames:
+                self.floor = float(np.median(self._calibration))
+            return None
+        loud = energy > self.threshold()
+
+        if self._started is None:
+            self.pre_roll.append(frame)
+            self._voiced = self._voiced + 1 if loud else 0
+            if not loud:
+                self.floor = 0.95 * self.floor + 0.05 * energy
+            if self._voiced >= self.start_frames:
+                self._started = time.time()
+                self._frames = list(self.pre_roll)
+                self.pre_roll.clear()
+                self._quiet = 0
+            return None
+
+        self._frames.append(frame)
+        self._quiet = 0 if loud else self._quiet + 1
+        if self._quiet >= self.silence_frames or len(self._frames) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self):
+        '''
+        Ends the current utterance, if there is one, and returns it.
+        '''
+        if self._started is None:
+            return None
+        segment = Segment(b''.join(self._frames), self.sample_rate, self._started, time.time())
+        self._frames, self._started, self._voiced = [], None, 0
+        return segment
+
+#========================
+#   Audio sources
+#========================
+class MicrophoneSource():
+
+    '''
+    One pyaudio input stream, opened once and read frame by frame for the whole session.
+    '''
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, device_index=None):
+        import pyaudio
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate, input=True,
+                                        frames_per_buffer=self.frame_samples, input_device_index=device_index)
+
+    def read(self):
+        return self._stream.read(self.frame_samples, exception_on_overflow=False)
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._audio.terminate()
+
+class PcmSource():
+
+    '''
+    Plays back recorded int16 PCM as if it came from the microphone; read() returns b'' at the
+    end. With realtime=True each frame is paced to the frame length.
+    '''
+    def __init__(self, pcm, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, realtime=False):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.realtime = realtime
+        self._pos = 0
+
+    def read(self):
+        frame = self.pcm[self._pos:self._pos + self.frame_bytes]
+        self._pos += self.frame_bytes
+        if self.realtime and frame:
+            time.sleep(len(frame) / 2.0 / self.sample_rate)
+        return frame
+
+    def close(self):
+        pass
+
+#========================
+#   Recognizers
+#========================
+#A recognizer is any callable taking a Segment and returning its text, or None if nothing was understood.
+class GoogleRecognizer():
+
+    def __init__(self, language='en-US'):
+        import speech_recognition as sr
+        self.sr = sr
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def __call__(self, segment):
+        audio = self.sr.AudioData(segment.pcm, segment.sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except self.sr.UnknownValueError:
+            return None
+        except self.sr.RequestError as e:
+            print("Error, no internet found.", e)
+            return None
+
+class StubRecognizer():
+
+    '''
+    Offline recognizer for testing: answers each segment with the next scripted transcript,
+    after an optional delay standing in for the network round trip.
+    '''
+    def __init__(self, transcripts, delay=0.0):
+        self.transcripts = deque(transcripts)
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, segment):
+        with self._lock:
+            text = self.transcripts.popleft() if self.transcripts else None
+        time.sleep(self.delay)
+        return text
+
+class Listener():
+
+    '''
+    Keeps capturing while earlier utterances are being recognized. A capture thread reads the
+    source and cuts it into segments, a dispatcher hands each segment to a pool of recognizer
+    workers, and listen() returns the transcripts in the order they were spoken.
+
+    If recognition falls behind by more than max_pending segments, new segments are dropped
+    (and counted in .dropped) rather than stalling the microphone. If reading the source
+    fails, listen() raises that error instead of waiting for a segment that never comes.
+    '''
+    def __init__(self, recognizer, source=None, segmenter=None, workers=2, max_pending=8):
+        self.recognizer = recognizer
+        self.source = source
+        self.segmenter = segmenter
+        self.dropped = 0
+        self.error = None
+        self._segments = queue.Queue(max_pending)
+        self._results = queue.Queue(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._running = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.source is None:
+            self.source = MicrophoneSource()
+        if self.segmenter is None:
+            self.segmenter = EnergySegmenter(self.source.sample_rate)
+        self._running.set()
+        for target, name in ((self._capture, 'speech-capture'), (self._dispatch, 'speech-dispatch')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _capture(self):
+        try:
+            while self._running.is_set():
+                frame = self.source.read()
+                if not frame:
+                    segment = self.segmenter.flush()
+                    self._running.clear()
+                else:
+                    segment = self.segmenter.feed(frame)
+                if segment is not None:
+                    try:
+                        self._segments.put_nowait(segment)
+                    except queue.Full:
+                        self.dropped += 1
+        except Exception as e:
+            self.error = e #handed to listen() behind the end of the stream
+        finally:
+            self._segments.put(None)
+
+    def _dispatch(self):
+        while True:
+            segment = self._segments.get()
+            if segment is None:
+                self._results.put(None)
+                return
+            self._results.put(self._executor.submit(self.recognizer, segment))
+
+    def listen(self, timeout=None):
+        '''
+        Returns the next thing said, waiting up to timeout seconds. Returns None on timeout or
+        once the source has run out, and raises the error that stopped the capture thread if
+        reading the source failed.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            try:
+                future = self._results.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if future is None:
+                self._results.put(None) #stay finished for later calls
+                if self.error is not None:
+                    raise self.error
+                return None
+            try:
+                text = future.result()
+            except Exception as e:
+                print("[Listener] Recognition failed:", e)
+                continue
+            if text:
+                return text
+
+    def stop(self):
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(1)
+        self.source.close()
+        self._executor.shutdown(wait=False)
+
+def demo():
+    '''
+    Runs three synthetic utterances through the pipeline with a slow stub recognizer, in real
+    time. Recognition of each utterance overlaps with capturing the next one.
+    '''
+    rate = SAMPLE_RATE
+    rng = np.random.RandomState(0)
+    def noise(sec):
+        return rng.normal(0, 50, int(rate * sec))
+    def tone(sec):
+        t = np.arange(int(rate * sec)) / float(rate)
+        return 4000 * np.sin(2 * np.pi * 220 * t) + noise(sec)
+    pcm = np.concatenate([noise(0.6), tone(0.8), noise(0.8), tone(0.5), noise(0.8), tone(1.0), noise(0.8)])
+    source = PcmSource(pcm.astype(np.int16).tobytes(), rate, realtime=True)
+    recognizer = StubRecognizer(['what time is it', 'weather please', 'goodbye'], delay=0.7)
+    t0 = time.time()
+    ears = Listener(recognizer, source).start()
+    while True:
+        text = ears.listen()
+        if text is None:
+            break
+        print("%6.2f s  %s" % (time.time() - t0, text))
+    print("audio length %0.2f s, total %0.2f s" % (len(pcm) / float(rate), time.time() - t0))
+    ears.stop()
+
+if __name__ == "__main__":
+    print(__about__)
+    demo()
@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  WEB LOOKUP SERVICE
+******************************************
+'''
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import Fresh, max_age, no_store
+
+#========================
+#   Providers
+#========================
+#Base urls for every provider. Pass your own to LookupService to point it at a local stub server.
+ENDPOINTS = {
+    'wolfram': 'http://api.wolframalpha.com',
+    'google': 'https://www.google.com',
+    'wikipedia': 'http://en.wikipedia.org',
+    'youtube': 'http://www.youtube.com',
+}
+
+#Seconds each provider gets before its answer is dropped
+TIMEOUTS = {
+    'wolfram': 4.0,
+    'google': 3.0,
+    'wikipedia': 3.0,
+    'youtube': 3.0,
+}
+
+WOLFRAM_APP_ID = "929P8L-QQPL5L6XT2"
+HEADERS = {"User-Agent": "Definitions/1.0"}
+
+class LookupService():
+
+    '''
+    Asks several web providers the same question at once and returns the first good answer.
+
+    Every provider shares one requests.Session, so connections to the same host are kept alive
+    and reused between questions instead of opening a new socket each time. The blocking calls
+    run on a small thread pool and are fanned out with asyncio; each one has its own timeout and
+    the slower providers are cancelled as soon as one of them answers.
+
+    Given a cache.LookupCache, wolfram and wikipedia answers are cached per question.
+    '''
+    def __init__(self, endpoints=None, timeouts=None, pool_size=8, cache=None):
+        self.cache = cache
+        self.endpoints = dict(ENDPOINTS, **(endpoints or {}))
+        self.timeouts = dict(TIMEOUTS, **(timeouts or {}))
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.providers = {
+            'wolfram': self.wolfram,
+            'google': self.google,
+            'wikipedia': self.wikipedia,
+            'youtube': self.youtube,
+        }
+
+    #========================
+    #   Provider calls
+    #========================
+    #Each one is blocking, takes the question and returns an answer string, or None if it has none.
+    def _get(self, name, path, **kwargs):
+        r = self.session.get(self.endpoints[name] + path, timeout=self.timeouts[name], **kwargs)
+        r.raise_for_status()
+        return r
+
+    def _cached(self, source, query, fetch):
+        if self.cache is not None:
+            return self.cache.get(source, query, fetch)
+        result = fetch()
+        return result.value if isinstance(result, Fresh) else result
+
+    def wolfram(self, query):
+        def fetch():
+            r = self._get('wolfram', '/v1/result', params={'appid': WOLFRAM_APP_ID, 'i': query})
+            return Fresh(r.text.strip() or None, max_age(r.headers), not no_store(r.headers))
+        return self._cached('wolfram', query, fetch)
+
+    def google(self, query):
+        from bs4 import BeautifulSoup
+        r = self._get('google', '/search', params={'q': query})
+        soup = BeautifulSoup(r.content, 'html.parser')
+        divs = soup.find_all('div')
+        if len(divs) < 28:
+            return None
+        resp = divs[27].get_text().replace("\n", "")
+        return "There are" + str(divs[22].get_text()) + " " + resp
+
+    def wikipedia(self, query):
+        params = {
+            'action':'query',
+            'prop':'extracts',
+            'format':'json',
+            'exintro':1,
+            'explaintext':1,
+            'generator':'search',
+            'gsrsearch':query.replace(" ", "_").capitalize(),
+            'gsrlimit':1,
+            'continue':''
+        }
+        def fetch():
+            r = self._get('wikipedia', '/w/api.php', params=params)
+            pages = r.json().get("query", {}).get("pages")
+            extract = list(pages.values())[0].get("extract") if pages else None
+            return Fresh(extract + '.' if extract else None, max_age(r.headers), not no_store(r.headers))
+        return self._cached('wikipedia', query, fetch)
+
+    def youtube(self, query):
+        r = self._get('youtube', '/results', params={'search_query': query})
+        found = re.search(r'href=\"\/watch\?v=(.{11})', r.text) or re.search(r'"videoId":"(.{11})"', r.text)
+        if found is None:
+            return None
+        return self.endpoints['youtube'] + "/watch?v=" + found.group(1)
+
+    #========================
+    #   Fan out
+    #========================
+    async def _ask(self, name, query):
+        loop = asyncio.get_event_loop()
+        call = loop.run_in_executor(self._executor, self.providers[name], query)
+        return name, await asyncio.wait_for(call, self.timeouts[name])
+
+    async def ask(self, query, names):
+        '''
+        Asks every named provider concurrently. Returns (provider, answer) for the first one that
+        answers, or (None, None) if they all failed, timed out or had nothing.
+        '''
+        pending = set(asyncio.ensure_future(self._ask(name, query)) for name in names)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result()[1]:
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            #The blocking call itself finishes on its thread; only its result is thrown away.
+            await asyncio.gather(*pending, return_exceptions=True)
+        return None, None
+
+    def first(self, query, names=None):
+        '''
+        Blocking wrapper around ask() for the synchronous parts of the assistant.
+        '''
+        names = list(names or self.providers)
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.ask(query, names))
+        finally:
+            loop.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+_service = None
+_service_lock = threading.Lock()
+
+def service():
+    '''
+    Returns the shared lookup service, so every question reuses the same connection pool.
+    '''
+    global _service
+    with _service_lock:
+        if _service is None:
+            import cache
+            _service = LookupService(cache=cache.shared())
+    return _service
+
+if __name__ == "__main__":
+    print(__about__)
+    #python lookup.py <question> asks every provider; tests/lookup_test.py runs them against a stub server
+    import sys
+    t0 = time.time()
+    print(service().first(' '.join(sys.argv[1:]) or 'what is the speed of light'), "in %0.3f s" % (time.time() - t0))
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# ==============================================================================
+# Copyright 2018 The Paragon Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+__about__ = '''
+******************************************
+  MEDICAL DICTIONARY INDEX
+******************************************
+'''
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+
+#Next to the assistant's other databases. It used to be opened from ./athena/Data/Databases, a
+#prefix left from when the project was called athena; main.py runs from main/, where Data/ is.
+DICTIONARY = './Data/Databases/Medical_Dictionary.txt'
+MAGIC = b'MEDIDX01'
+#magic, number of terms, size and mtime of the dictionary the index was built from
+HEADER = struct.Struct('<8sQQd')
+OFFSET = struct.Struct('<Q')
+
+#"Term: definition", "Term - definition" or "Term -- definition" on one line
+TERM_LINE = re.compile(r'^\s*([^:]{1,80}?)\s*(?::|\s-{1,2}\s|\s–\s|\s—\s)\s*(\S.*)$')
+
+def index_path(dictionary):
+    return os.path.splitext(dictionary)[0] + '.idx'
+
+def entries(dictionary):
+    '''
+    Yields (term, offset, length) for every entry of the dictionary, where offset and length
+    give the definition's bytes in the file. An entry is either a "term: definition" line, or
+    a block of lines separated by blank lines whose first line is the term.
+    '''
+    with open(dictionary, 'rb') as f:
+        data = f.read()
+    pos = 0
+    term, start, end, inline = None, 0, 0, False
+    for raw in data.splitlines(True):
+        line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+        line_start, pos = pos, pos + len(raw)
+        if not line.strip():
+            if term is not None:
+                yield term, start, end - start
+            term = None
+            continue
+        found = TERM_LINE.match(line) if term is None or inline else None
+        if found and term is not None:
+            #one "term: definition" per line, with no blank lines in between
+            yield term, start, end - start
+            term = None
+        if term is None:
+            inline = found is not None
+            if found:
+                term = found.group(1)
+                start = line_start + len(line[:found.start(2)].encode('utf-8'))
+            else:
+                term, start = line.strip(), pos
+            end = line_start + len(line.encode('utf-8'))
+            continue
+        end = line_start + len(line.encode('utf-8'))
+    if term is not None:
+        yield term, start, end - start
+
+def build(dictionary=DICTIONARY, path=None):
+    '''
+    One time build step: writes a sorted index of every term next to the dictionary. The index
+    is a header, a table of fixed size offsets (one per term, in sorted order) and then the
+    "term\\toffset\\tlength" records, so a lookup can binary search the table in place.
+    '''
+    path = path or index_path(dictionary)
+    records = sorted((term.lower().strip(), offset, length)
+                     for term, offset, length in entries(dictionary) if length > 0)
+    stat = os.stat(dictionary)
+    body, offsets = [], []
+    position = HEADER.size + OFFSET.size * len(records)
+    for term, offset, length in records:
+        record = ('%s\t%d\t%d\n' % (term.replace('\t', ' '), offset, length)).encode('utf-8')
+        offsets.append(position)
+        body.append(record)
+        position += len(record)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(records), stat.st_size, stat.st_mtime))
+        f.write(b''.join(OFFSET.pack(o) for o in offsets))
+        f.write(b''.join(body))
+    os.replace(tmp, path)
+    return path
+
+class MedicalDictionary():
+
+    '''
+    Looks terms up in the medical dictionary through its index. Both files are memory mapped,
+    so nothing is read up front and a lookup is a binary search over the index (O(log n) page
+    touches) followed by one slice of the dictionary.
+    '''
+    def __init__(self, dictionary=DICTIONARY, path=None):
+        self.dictionary = dictionary
+        self.path = path or index_path(dictionary)
+        if self._stale():
+            build(dictionary, self.path)
+        with open(self.path, 'rb') as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(dictionary, 'rb') as f:
+            self.text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = HEADER.unpack_from(self.index, 0)[1]
+
+    def _stale(self):
+        if not os.path.exists(self.path):
+            return True
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return True
+        magic, count, size, mtime = HEADER.unpack(header)
+        stat = os.stat(self.dictionary)
+        return magic != MAGIC or size != stat.st_size or mtime != stat.st_mtime
+
+    def _record(self, i):
+        start = OFFSET.unpack_from(self.index, HEADER.size + OFFSET.size * i)[0]
+        end = self.index.find(b'\n', start)
+        term, offset, length = self.index[start:end].decode('utf-8').split('\t')
+        return term, int(offset), int(length)
+
+    def _bisect(self, term):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, term):
+        '''
+        Returns every definition of the term, or of the first term starting with it when there
+        is no exact entry. Returns an empty list if there is neither.
+        '''
+        term = term.lower().strip()
+        if not term:
+            return []
+        i = self._bisect(term)
+        if i == self.count or not self._record(i)[0].startswith(term):
+            return []
+        match = self._record(i)[0]
+        definitions = []
+        while i < self.count:
+            found, offset, length = self._record(i)
+            if found != match:
+                break
+            definitions.append(self.text[offset:offset + length].decode('utf-8', 'replace').strip())
+            i += 1
+        return definitions
+
+    def define(self, term):
+        definitions = self.lookup(term)
+        return definitions[0] if definitions else None
+
+    def close(self):
+        self.index.close()
+        self.text.close()
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+def dictionary():
+    '''
+    Returns the shared dictionary, building its index the first time if needed.
+    '''
+    global _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            _dictionary = MedicalDictionary()
+    return _dictionary
+
+if __name__ == "__main__":
+    print(__about__)
+    source = sys.argv[1] if len(sys.argv) > 1 else DICTIONARY
+    print("Index written to", build(source))
@@ -15,13 +15,15 @@
 # limitations under the License.
 # ==============================================================================
 
-import math, re, string, requests, json
-from itertools import product
+import math, re, string, requests, json, marshal, os
+from itertools import chain, islice, product
 from inspect import getsourcefile
 from os.path import abspath, join, dirname
 
 ##Constants##
 
+_MODULE_DIR = dirname(abspath(getsourcefile(lambda:0)))
+
 # (empirically derived mean sentiment intensity rating increase for booster words)
 B_INCR = 0.293
 B_DECR = -0.293
@@ -37,6 +39,12 @@ REGEX_REMOVE_PUNCTUATION = re.compile('[%s]' % re.escape(string.punctuation))
 
 PUNC_LIST = [".", "!", "?", ",", ";", ":", "-", "'", "\"",
              "!!", "!!!", "??", "???", "?!?", "!?!", "?!?!", "!?!?"]
+
+# a token made of one PUNC_LIST mark and a punctuation-free word of 2+ characters, in either
+# order; group 1 or 2 is the word
+_PUNC_ALTS = '|'.join(re.escape(p) for p in PUNC_LIST)
+_BARE_WORD = '[^%s\\s]{2,}' % re.escape(string.punctuation)
+REGEX_STRIP_PUNC = re.compile('^(?:%s)(%s)$|^(%s)(?:%s)$' % (_PUNC_ALTS, _BARE_WORD, _BARE_WORD, _PUNC_ALTS))
 NEGATE = \
 ["aint", "arent", "cannot", "cant", "couldnt", "darent", "didnt", "doesnt",
  "ain't", "aren't", "can't", "couldn't", "daren't", "didn't", "doesn't",
@@ -73,6 +81,13 @@ BOOSTER_DICT = \
 SPECIAL_CASE_IDIOMS = {"the shit": 3, "the bomb": 3, "bad ass": 1.5, "yeah right": -2,
                        "cut the mustard": 2, "kiss of death": -1.5, "hand to mouth": -2}
 
+# every word that is part of an idiom or a multi-word booster; a token window with none of
+# these in it can't match either, so the idiom check can skip building the n-grams
+IDIOM_WORDS = frozenset(w for phrase in list(SPECIAL_CASE_IDIOMS) + list(BOOSTER_DICT)
+                        if " " in phrase for w in phrase.split())
+
+NEGATE_SET = frozenset(NEGATE)
+
 
 ##Static methods##
 
@@ -94,6 +109,63 @@ def negated(input_words, include_nt=True):
     return False
 
 
+def negated_word(word):
+
+    # same as negated([word]), without scanning the whole NEGATE list
+    return word in NEGATE_SET or "n't" in word
+
+
+# compiled lexicons, bumped whenever the snapshot layout changes
+LEXICON_FORMAT = 2
+# every lexicon loaded so far, by path; analyzers built on the same file share one dict
+_LEXICONS = {}
+
+
+def parse_lexicon(text):
+
+    lex_dict = {}
+    for line in text.split('\n'):
+        (word, measure) = line.strip().split('\t')[0:2]
+        lex_dict[word] = float(measure)
+    return lex_dict
+
+
+def load_lexicon(path):
+
+    """
+    Returns the lexicon in the text file at path as a word -> valence dict. The parsed dict is
+    snapshotted with marshal next to the text (path + ".marshal") along with the text's mtime
+    and size, and the snapshot is used for as long as both match, without reading the text.
+    The dict is shared: later calls for the same path return the same object.
+    """
+    path = abspath(path)
+    if path in _LEXICONS:
+        return _LEXICONS[path]
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    compiled = path + ".marshal"
+    lex_dict = None
+    try:
+        with open(compiled, 'rb') as f:
+            fmt, stored_stamp, snapshot = marshal.loads(f.read()) # load(f) reads in small pieces
+        if fmt == LEXICON_FORMAT and stored_stamp == stamp:
+            lex_dict = snapshot
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    if lex_dict is None:
+        with open(path, encoding='utf-8') as f:
+            lex_dict = parse_lexicon(f.read())
+        try:
+            tmp = "{}.{}.tmp".format(compiled, os.getpid())
+            with open(tmp, 'wb') as f:
+                marshal.dump((LEXICON_FORMAT, stamp, lex_dict), f)
+            os.replace(tmp, compiled)
+        except OSError:
+            pass # read-only install, parse the text every time
+    _LEXICONS[path] = lex_dict
+    return lex_dict
+
+
 def normalize(score, alpha=15):
 
     norm_score = score/math.sqrt((score*score) + alpha)
@@ -144,32 +216,20 @@ class SentiText(object):
             text = str(text.encode('utf-8'))
         self.text = text
         self.words_and_emoticons = self._words_and_emoticons()
+        self.words_lower = [we.lower() for we in self.words_and_emoticons]
         # doesn't separate words from\
         # adjacent punctuation (keeps emoticons & contractions)
         self.is_cap_diff = allcap_differential(self.words_and_emoticons)
 
-    def _words_plus_punc(self):
-
-        no_punc_text = REGEX_REMOVE_PUNCTUATION.sub('', self.text)
-        # removes punctuation (but loses emoticons & contractions)
-        words_only = no_punc_text.split()
-        # remove singletons
-        words_only = set( w for w in words_only if len(w) > 1 )
-        # the product gives ('cat', ',') and (',', 'cat')
-        punc_before = {''.join(p): p[1] for p in product(PUNC_LIST, words_only)}
-        punc_after = {''.join(p): p[0] for p in product(words_only, PUNC_LIST)}
-        words_punc_dict = punc_before
-        words_punc_dict.update(punc_after)
-        return words_punc_dict
-
     def _words_and_emoticons(self):
 
-        wes = self.text.split()
-        words_punc_dict = self._words_plus_punc()
-        wes = [we for we in wes if len(we) > 1]
+        # strips one leading or trailing PUNC_LIST mark off words ("cat," -> "cat") but leaves
+        # emoticons and contractions alone; singletons are dropped
+        wes = [we for we in self.text.split() if len(we) > 1]
         for i, we in enumerate(wes):
-            if we in words_punc_dict:
-                wes[i] = words_punc_dict[we]
+            found = REGEX_STRIP_PUNC.match(we)
+            if found:
+                wes[i] = found.group(1) or found.group(2)
         return wes
 
 class SentimentIntensityAnalyzer(object):
@@ -180,22 +240,36 @@ class SentimentIntensityAnalyzer(object):
 
     def __init__(self, lexicon_file="vader_lexicon.txt"):
 
-        _this_module_file_path_ = abspath(getsourcefile(lambda:0))
-        lexicon_full_filepath = join(dirname(_this_module_file_path_), lexicon_file)
-        with open(lexicon_full_filepath, encoding='utf-8') as f:
-            self.lexicon_full_filepath = f.read()
-        self.lexicon = self.make_lex_dict()
+        self.lexicon_path = join(_MODULE_DIR, lexicon_file)
+        self._lexicon = None
+
+    @property
+    def lexicon(self):
+
+        """
+        The word -> valence dict, loaded the first time it is asked for
+        """
+        if self._lexicon is None:
+            self._lexicon = self.make_lex_dict()
+        return self._lexicon
+
+    @property
+    def lexicon_full_filepath(self):
+
+        """
+        The text of the lexicon file, read the first time it is asked for
+        """
+        if getattr(self, "_lexicon_text", None) is None:
+            with open(self.lexicon_path, encoding='utf-8') as f:
+                self._lexicon_text = f.read()
+        return self._lexicon_text
 
     def make_lex_dict(self):
 
         """
-        Convert lexicon file to a dictionary
+        Convert lexicon file to a dictionary (shared between analyzers, see load_lexicon)
         """
-        lex_dict = {}
-        for line in self.lexicon_full_filepath.split('\n'):
-            (word, measure) = line.strip().split('\t')[0:2]
-            lex_dict[word] = float(measure)
-        return lex_dict
+        return load_lexicon(self.lexicon_path)
 
     def polarity_scores(self, text):
 
@@ -207,14 +281,16 @@ class SentimentIntensityAnalyzer(object):
         sentitext = SentiText(text)
         #text, words_and_emoticons, is_cap_diff = self.preprocess(text)
 
+        # one pass over the tokens by position, so repeated words are each scored where they are
         sentiments = []
         words_and_emoticons = sentitext.words_and_emoticons
-        for item in words_and_emoticons:
+        words_lower = sentitext.words_lower
+        last = len(words_and_emoticons) - 1
+        for i, item in enumerate(words_and_emoticons):
             valence = 0
-            i = words_and_emoticons.index(item)
-            if (i < len(words_and_emoticons) - 1 and item.lower() == "kind" and \
-                words_and_emoticons[i+1].lower() == "of") or \
-                item.lower() in BOOSTER_DICT:
+            item_lowercase = words_lower[i]
+            if (i < last and item_lowercase == "kind" and words_lower[i+1] == "of") or \
+                item_lowercase in BOOSTER_DICT:
                 sentiments.append(valence)
                 continue
 
@@ -226,14 +302,35 @@ class SentimentIntensityAnalyzer(object):
 
         return valence_dict
 
+    def polarity_scores_batch(self, texts, vectorized=False, batch_size=4096):
+
+        """
+        Scores any iterable of texts lazily, yielding one polarity_scores dict per text in order.
+        With vectorized=True the texts are scored batch_size at a time by VectorizedScorer,
+        which needs numpy and matches polarity_scores to within float rounding.
+        """
+        if not vectorized:
+            for text in texts:
+                yield self.polarity_scores(text)
+            return
+        if getattr(self, "_vectorized", None) is None:
+            self._vectorized = VectorizedScorer(self)
+        texts = iter(texts)
+        batch = list(islice(texts, batch_size))
+        while batch:
+            yield from self._vectorized.score(batch)
+            batch = list(islice(texts, batch_size))
+
     def sentiment_valence(self, valence, sentitext, item, i, sentiments):
 
         is_cap_diff = sentitext.is_cap_diff
         words_and_emoticons = sentitext.words_and_emoticons
-        item_lowercase = item.lower()
-        if item_lowercase in self.lexicon:
+        words_lower = sentitext.words_lower
+        lexicon = self.lexicon
+        item_lowercase = words_lower[i]
+        if item_lowercase in lexicon:
             #get the sentiment valence
-            valence = self.lexicon[item_lowercase]
+            valence = lexicon[item_lowercase]
 
             #check if sentiment laden word is in ALL CAPS (while others aren't)
             if item.isupper() and is_cap_diff:
@@ -244,7 +341,7 @@ class SentimentIntensityAnalyzer(object):
 
             for start_i in range(0,3):
 
-                if i > start_i and words_and_emoticons[i-(start_i+1)].lower() not in self.lexicon:
+                if i > start_i and words_lower[i-(start_i+1)] not in lexicon:
                     # dampen the scalar modifier of preceding words and emoticons
                     # (excluding the ones that immediately preceed the item) based
                     # on their distance from the current item.
@@ -265,20 +362,18 @@ class SentimentIntensityAnalyzer(object):
                         #  "cooking with gas": 2, "in the black": 2, "in the red": -2,
                         #  "on the ball": 2,"under the weather": -2}
 
-            valence = self._least_check(valence, words_and_emoticons, i)
+            valence = self._least_check(valence, words_lower, i)
 
         sentiments.append(valence)
         return sentiments
 
-    def _least_check(self, valence, words_and_emoticons, i):
+    def _least_check(self, valence, words_lower, i):
 
-        # check for negation case using "least"
-        if i > 1 and words_and_emoticons[i-1].lower() not in self.lexicon \
-           and words_and_emoticons[i-1].lower() == "least":
-            if words_and_emoticons[i-2].lower() != "at" and words_and_emoticons[i-2].lower() != "very":
+        # check for negation case using "least" (words_lower is the lowercased tokens)
+        if i > 1 and words_lower[i-1] == "least" and "least" not in self.lexicon:
+            if words_lower[i-2] != "at" and words_lower[i-2] != "very":
                 valence = valence*N_SCALAR
-        elif i > 0 and words_and_emoticons[i-1].lower() not in self.lexicon \
-             and words_and_emoticons[i-1].lower() == "least":
+        elif i > 0 and words_lower[i-1] == "least" and "least" not in self.lexicon:
             valence = valence*N_SCALAR
         return valence
 
@@ -290,18 +385,19 @@ class SentimentIntensityAnalyzer(object):
                 bi = words_and_emoticons.index('but')
             except ValueError:
                 bi = words_and_emoticons.index('BUT')
-            for sentiment in sentiments:
-                si = sentiments.index(sentiment)
+            for si, sentiment in enumerate(sentiments):
                 if si < bi:
-                    sentiments.pop(si)
-                    sentiments.insert(si, sentiment*0.5)
+                    sentiments[si] = sentiment*0.5
                 elif si > bi:
-                    sentiments.pop(si)
-                    sentiments.insert(si, sentiment*1.5)
+                    sentiments[si] = sentiment*1.5
         return sentiments
 
     def _idioms_check(self, valence, words_and_emoticons, i):
 
+        # nothing within three tokens of i belongs to an idiom, so none of the n-grams can match
+        if not any(we in IDIOM_WORDS for we in words_and_emoticons[i-3:i+3]):
+            return valence
+
         onezero = "{0} {1}".format(words_and_emoticons[i-1], words_and_emoticons[i])
 
         twoonezero = "{0} {1} {2}".format(words_and_emoticons[i-2],
@@ -338,21 +434,21 @@ class SentimentIntensityAnalyzer(object):
     def _never_check(self, valence, words_and_emoticons, start_i, i):
 
         if start_i == 0:
-            if negated([words_and_emoticons[i-1]]):
+            if negated_word(words_and_emoticons[i-1]):
                     valence = valence*N_SCALAR
         if start_i == 1:
             if words_and_emoticons[i-2] == "never" and\
                (words_and_emoticons[i-1] == "so" or
                 words_and_emoticons[i-1] == "this"):
                 valence = valence*1.5
-            elif negated([words_and_emoticons[i-(start_i+1)]]):
+            elif negated_word(words_and_emoticons[i-(start_i+1)]):
                 valence = valence*N_SCALAR
         if start_i == 2:
             if words_and_emoticons[i-3] == "never" and \
                (words_and_emoticons[i-2] == "so" or words_and_emoticons[i-2] == "this") or \
                (words_and_emoticons[i-1] == "so" or words_and_emoticons[i-1] == "this"):
                 valence = valence*1.25
-            elif negated([words_and_emoticons[i-(start_i+1)]]):
+            elif negated_word(words_and_emoticons[i-(start_i+1)]):
                 valence = valence*N_SCALAR
         return valence
 
@@ -441,30 +537,466 @@ class SentimentIntensityAnalyzer(object):
              "compound" : round(compound, 4)}
         return sentiment_dict
 
+class _TokenIds(dict):
+
+    # whitespace token -> id, filled in on first sight
+    def __init__(self, scorer):
+        self.scorer = scorer
+
+    def __missing__(self, token):
+        return self.scorer._token_id(token)
+
+
+class VectorizedScorer(object):
+
+    """
+    The polarity_scores rules applied to a whole batch of sentences at once. Every distinct
+    token is mapped to an integer id the first time it is seen, along with everything the rules
+    need to know about it (valence, booster value, ALLCAPS, negation, ...). A batch is joined
+    into one string, split once and turned into one flat array of ids, and each rule that looks
+    back up to three tokens reads the ids at those positions with one fancy index. Idioms and
+    booster bigrams are looked up as n-gram codes in sorted tables.
+    """
+
+    _FEATURES = ("valence", "booster", "upper", "negated", "never", "so_this", "kind", "of",
+                 "least", "at_very", "but", "BUT", "phrase")
+
+    def __init__(self, analyzer):
+        import numpy
+        self.np = numpy
+        self.analyzer = analyzer
+        self.lexicon = analyzer.lexicon
+        self.least_in_lexicon = "least" in self.lexicon
+        self.ids = {}
+        self.token_ids = _TokenIds(self)
+        self.features = []  # one tuple of _FEATURES per id
+        self.arrays = None
+        self.phrase_words = set(chain.from_iterable(phrase.split() for phrase in
+                                                    chain(SPECIAL_CASE_IDIOMS, BOOSTER_DICT)))
+        self._id("")  # id 0 stands for the missing tokens before the start of a text
+        self.token_ids[self._SEPARATOR] = -2  # ends each sentence in the joined batch
+        idioms = [(tuple(self._id(w) for w in phrase.split()), value)
+                  for phrase, value in SPECIAL_CASE_IDIOMS.items()]
+        bigrams = [(tuple(self._id(w) for w in phrase.split()), B_DECR)
+                   for phrase in BOOSTER_DICT if len(phrase.split()) == 2]
+        # every phrase word has an id below base; any later token is clipped to base - 1
+        self.base = len(self.ids) + 1
+        self.idioms2 = self._table([idiom for idiom in idioms if len(idiom[0]) == 2])
+        self.idioms3 = self._table([idiom for idiom in idioms if len(idiom[0]) == 3])
+        self.booster_bigrams = self._table(bigrams)
+
+    _SEPARATOR = "\x00"
+    _UPPER, _SCORED, _KIND, _OF, _PHRASE, _BUT_UPPER, _BUT = 1, 2, 4, 8, 16, 32, 64
+
+    def _table(self, phrases):
+        # (n, sorted n-gram codes, their values) for phrases of n words
+        np = self.np
+        codes = [sum(w * self.base ** (len(words) - 1 - k) for k, w in enumerate(words))
+                 for words, value in phrases]
+        order = np.argsort(codes)
+        return (len(phrases[0][0]) if phrases else 1, np.array(codes, dtype=np.int64)[order],
+                np.array([value for words, value in phrases], dtype=float)[order])
+
+    def _id(self, word):
+        if word in self.ids:
+            return self.ids[word]
+        self.ids[word] = len(self.ids)
+        lower = word.lower()
+        self.features.append((
+            self.lexicon.get(lower, float("nan")) if word else float("nan"),
+            BOOSTER_DICT.get(lower, 0.0),
+            word.isupper(),
+            bool(word) and negated_word(word),
+            word == "never",
+            word == "so" or word == "this",
+            lower == "kind",
+            lower == "of",
+            lower == "least",
+            lower == "at" or lower == "very",
+            word == "but",
+            word == "BUT",
+            word in self.phrase_words))
+        return self.ids[word]
+
+    def _token_id(self, token):
+        # same as SentiText._words_and_emoticons for one whitespace separated token; -1 drops it
+        if len(token) <= 1:
+            i = -1
+        else:
+            found = REGEX_STRIP_PUNC.match(token)
+            i = self._id(found.group(1) or found.group(2) if found else token)
+        self.token_ids[token] = i
+        return i
+
+    def encode(self, texts):
+        """
+        Turns a list of texts into what score_encoded needs: the ids of all their tokens one
+        after the other, the text each token belongs to, the token count of every text and its
+        "!" and "?" counts. A corpus scored more than once only needs encoding once.
+        """
+        np = self.np
+        joined = (" %s " % self._SEPARATOR).join(texts)
+        if joined.count(self._SEPARATOR) != max(len(texts) - 1, 0):
+            raise ValueError("texts may not contain %r" % self._SEPARATOR)
+        tokens = joined.split()
+        flat = np.fromiter(map(self.token_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        row = np.cumsum(flat == -2)
+        keep = flat > 0
+        ids, row = flat[keep], row[keep]
+        lengths = np.bincount(row, minlength=len(texts))
+        if self.arrays is None or len(self.arrays["bits"]) < len(self.ids):
+            self._extend_arrays()
+
+        raw = np.frombuffer(joined.encode("utf-8"), dtype=np.uint8)
+        ends = np.flatnonzero(raw == 0)
+        marks = [np.bincount(np.searchsorted(ends, np.flatnonzero(raw == ord(mark))), minlength=len(texts))
+                 for mark in "!?"]
+        return ids, row, lengths, marks[0], marks[1]
+
+    def _extend_arrays(self):
+        # the feature arrays of the ids added since the last batch, appended to the others
+        np = self.np
+        done = 0 if self.arrays is None else len(self.arrays["bits"])
+        block = np.array(self.features[done:], dtype=float).reshape(-1, len(self._FEATURES))
+        a = {name: np.ascontiguousarray(block[:, k] if name in ("valence", "booster") else block[:, k] != 0)
+             for k, name in enumerate(self._FEATURES)}
+        # the flags every rule reads for the whole batch, packed so that is one lookup
+        a["bits"] = (a["upper"] * self._UPPER | a["kind"] * self._KIND | a["of"] * self._OF |
+                     a["phrase"] * self._PHRASE | a["BUT"] * self._BUT_UPPER | a["but"] * self._BUT |
+                     (~np.isnan(a["valence"]) & (a["booster"] == 0)) * self._SCORED).astype(np.uint8)
+        if self.arrays is not None:
+            a = {name: np.concatenate((self.arrays[name], values)) for name, values in a.items()}
+        self.arrays = a
+
+    def _phrases(self, ids, p, c, length, offset, table):
+        # value of the phrase starting offset tokens after token p, which is token c of a text
+        # of length tokens (nan where none starts)
+        np = self.np
+        n, codes, values = table
+        out = np.full(len(p), np.nan)
+        if not len(codes):
+            return out
+        inside = (c + offset >= 0) & (c + offset + n <= length)
+        code = np.zeros(len(p), dtype=np.int64)
+        for k in range(n):
+            code = code * self.base + np.minimum(ids.take(p + offset + k, mode="clip"), self.base - 1)
+        at = np.minimum(np.searchsorted(codes, code), len(codes) - 1)
+        match = inside & (codes[at] == code)
+        out[match] = values[at[match]]
+        return out
+
+    def _first(self, row, col, where, size):
+        # column of the first token of every text that where is true for (-1 where none is)
+        np = self.np
+        first = np.full(size, -1)
+        q = np.flatnonzero(where)
+        rq = row[q]
+        new = np.ones(len(q), dtype=bool)
+        new[1:] = rq[1:] != rq[:-1]
+        first[rq[new]] = col[q[new]]
+        return first
+
+    def sentiments(self, ids, row, lengths):
+        """
+        Per token valences for encoded texts, as polarity_scores computes them before
+        score_valence. Only tokens with a lexicon valence can end up non-zero, so the rules run
+        on those positions alone and look their neighbours up by index. Returns the text and
+        the valence of each of those tokens, in order.
+        """
+        np = self.np
+        a = self.arrays
+        col = np.arange(len(ids)) - (np.cumsum(lengths) - lengths)[row]
+        bits = a["bits"][ids]
+
+        n_upper = np.bincount(row[bits & self._UPPER != 0], minlength=len(lengths))
+        cap_diff = (lengths - n_upper > 0) & (lengths - n_upper < lengths)
+
+        # tokens that get a valence: in the lexicon, not a booster, not the "kind" of "kind of"
+        kind_of = np.zeros(len(ids), dtype=bool)
+        kind_of[:-1] = (bits[:-1] & self._KIND != 0) & (bits[1:] & self._OF != 0) & (row[1:] == row[:-1])
+        p = np.flatnonzero((bits & self._SCORED != 0) & ~kind_of)
+        r, c = row[p], col[p]
+        cap = cap_diff[r]
+
+        def at(offset):
+            # ids of the token offset positions back (0 before the start of the text)
+            inside = c >= offset
+            return np.where(inside, ids.take(p - offset, mode="clip"), 0), inside
+
+        v = a["valence"][ids[p]]
+        v = np.where(a["upper"][ids[p]] & cap, np.where(v > 0, v + C_INCR, v - C_INCR), v)
+
+        prev = [at(k) for k in range(4)]
+        for k in range(3):
+            back, exists = prev[k + 1]
+            cond = exists & np.isnan(a["valence"][back])
+            scalar = a["booster"][back]
+            scalar = np.where(v < 0, -scalar, scalar)
+            scalar = np.where((scalar != 0) & a["upper"][back] & cap,
+                              np.where(v > 0, scalar + C_INCR, scalar - C_INCR), scalar)
+            if k == 1:
+                scalar = scalar * 0.95
+            elif k == 2:
+                scalar = scalar * 0.9
+            v = np.where(cond, v + scalar, v)
+
+            # _never_check
+            if k == 0:
+                v = np.where(cond & a["negated"][back], v * N_SCALAR, v)
+            elif k == 1:
+                never_so = a["never"][prev[2][0]] & a["so_this"][prev[1][0]]
+                v = np.where(cond & never_so, v * 1.5, v)
+                v = np.where(cond & ~never_so & a["negated"][back], v * N_SCALAR, v)
+            else:
+                never_so = (a["never"][prev[3][0]] & a["so_this"][prev[2][0]]) | a["so_this"][prev[1][0]]
+                v = np.where(cond & never_so, v * 1.25, v)
+                v = np.where(cond & ~never_so & a["negated"][back], v * N_SCALAR, v)
+
+                # _idioms_check, only for texts that contain a word of some idiom at all:
+                # the first idiom ending at or before the token, then ones starting at it
+                has_phrase = np.zeros(len(lengths), dtype=bool)
+                has_phrase[row[bits & self._PHRASE != 0]] = True
+                sub = np.flatnonzero(cond & has_phrase[r])
+                ps, cs, ls = p[sub], c[sub], lengths[r[sub]]
+                idiom = np.full(len(sub), np.nan)
+                for offset, phrases in ((-1, self.idioms2), (-2, self.idioms3), (-2, self.idioms2),
+                                        (-3, self.idioms3), (-3, self.idioms2)):
+                    idiom = np.where(np.isnan(idiom), self._phrases(ids, ps, cs, ls, offset, phrases), idiom)
+                for phrases in (self.idioms2, self.idioms3):
+                    found = self._phrases(ids, ps, cs, ls, 0, phrases)
+                    idiom = np.where(np.isnan(found), idiom, found)
+                v[sub] = np.where(np.isnan(idiom), v[sub], idiom)
+                bigram = ~np.isnan(self._phrases(ids, ps, cs, ls, -3, self.booster_bigrams)) | \
+                         ~np.isnan(self._phrases(ids, ps, cs, ls, -2, self.booster_bigrams))
+                v[sub] = np.where(bigram, v[sub] + B_DECR, v[sub])
+
+        # _least_check
+        if not self.least_in_lexicon:
+            least = a["least"][prev[1][0]]
+            negate = least & ((c == 1) | ((c > 1) & ~a["at_very"][prev[2][0]]))
+            v = np.where(negate, v * N_SCALAR, v)
+
+        # _but_check: scale around the first "but", or failing that the first "BUT"
+        b = self._first(row, col, bits & self._BUT != 0, len(lengths))
+        b = np.where(b >= 0, b, self._first(row, col, bits & self._BUT_UPPER != 0, len(lengths)))[r]
+        v = np.where((b >= 0) & (c < b), v * 0.5, np.where((b >= 0) & (c > b), v * 1.5, v))
+        return r, v
+
+    def score(self, texts):
+        """
+        Returns the polarity_scores dict of every text, in order.
+        """
+        texts = list(texts)
+        if all(isinstance(text, str) for text in texts):
+            return self.score_encoded(self.encode(texts))
+        results = [None if isinstance(text, str) else self.analyzer.polarity_scores(text) for text in texts]
+        batch = [i for i, text in enumerate(texts) if isinstance(text, str)]
+        if batch:
+            for i, vs in zip(batch, self.score_encoded(self.encode([texts[i] for i in batch]))):
+                results[i] = vs
+        return results
+
+    def score_encoded(self, encoded):
+        """
+        Returns the polarity_scores dict of every text encode was given, in order.
+        """
+        np = self.np
+        ids, row, lengths, exclamations, questions = encoded
+        r, v = self.sentiments(ids, row, lengths)
+
+        # bincount adds each text's valences in order, left to right like score_valence does;
+        # at a sum of ~0 the order decides the sign
+        size = len(lengths)
+        sum_s = np.bincount(r, weights=v, minlength=size)
+        pos_sum = np.bincount(r, weights=np.where(v > 0, v + 1, 0.0), minlength=size)
+        neg_sum = np.bincount(r, weights=np.where(v < 0, v - 1, 0.0), minlength=size)
+        neu_count = lengths - np.bincount(r[v != 0], minlength=size)
+        ep = np.minimum(exclamations, 4) * 0.292
+        qm_count = questions
+        qm = np.where(qm_count > 1, np.where(qm_count <= 3, qm_count * 0.18, 0.96), 0.0)
+        amplifier = ep + qm
+
+        sum_s = np.where(sum_s > 0, sum_s + amplifier, np.where(sum_s < 0, sum_s - amplifier, sum_s))
+        compound = np.clip(sum_s / np.sqrt(sum_s * sum_s + 15), -1.0, 1.0)
+        pos_more = pos_sum > np.abs(neg_sum)
+        neg_more = pos_sum < np.abs(neg_sum)
+        pos_sum = np.where(pos_more, pos_sum + amplifier, pos_sum)
+        neg_sum = np.where(neg_more, neg_sum - amplifier, neg_sum)
+        total = pos_sum + np.abs(neg_sum) + neu_count
+        safe = np.where(total > 0, total, 1.0)
+        pos = np.abs(pos_sum / safe)
+        neg = np.abs(neg_sum / safe)
+        neu = np.abs(neu_count / safe)
+
+        empty = {"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0}
+        rounded = zip(lengths.tolist(), np.round(neg, 3).tolist(), np.round(neu, 3).tolist(),
+                      np.round(pos, 3).tolist(), np.round(compound, 4).tolist())
+        return [{"neg": ng, "neu": nu, "pos": ps, "compound": cp} if n else dict(empty)
+                for n, ng, nu, ps, cp in rounded]
+
+
+def _legacy_words_and_emoticons(text):
+
+    # the original tokenizer, kept for benchmark_tokenizer: a dict of every punctuation mark
+    # before and after every word in the text
+    no_punc_text = REGEX_REMOVE_PUNCTUATION.sub('', text)
+    words_only = set(w for w in no_punc_text.split() if len(w) > 1)
+    words_punc_dict = {''.join(p): p[1] for p in product(PUNC_LIST, words_only)}
+    words_punc_dict.update({''.join(p): p[0] for p in product(words_only, PUNC_LIST)})
+    wes = [we for we in text.split() if len(we) > 1]
+    return [words_punc_dict.get(we, we) for we in wes]
+
+
+def benchmark_tokenizer(repeat=20):
+
+    """
+    Times SentiText tokenization against the original product-dict tokenizer, on a short
+    sentence and on a long document, and checks that both give the same tokens.
+    """
+    import time
+    sentence = "VADER is VERY SMART, uber handsome, and FRIGGIN FUNNY!!! :) can't wait..."
+    with open(join(_MODULE_DIR, "vader_lexicon.txt"), encoding='utf-8') as f:
+        document = ' '.join(line.split('\t')[0] + PUNC_LIST[i % len(PUNC_LIST)]
+                            for i, line in enumerate(f.read().split('\n')))
+    for name, text in (("sentence", sentence), ("document", document)):
+        assert SentiText(text).words_and_emoticons == _legacy_words_and_emoticons(text)
+        t0 = time.time()
+        for _ in range(repeat):
+            _legacy_words_and_emoticons(text)
+        legacy = (time.time() - t0) / repeat
+        t0 = time.time()
+        for _ in range(repeat):
+            SentiText(text)
+        current = (time.time() - t0) / repeat
+        print("{:<10} {:>8} tokens   legacy {:9.3f} ms   regex {:9.3f} ms".format(
+            name, len(text.split()), legacy * 1e3, current * 1e3))
+
+
+##Corpus labelling##
+
+# the seq2seq training sets, one out.txt per sentiment
+VOCAL_DIR = join(_MODULE_DIR, "..", "..", "lib", "VOCAL")
+BUCKETS = {"pos": "POS", "neg": "NEG", "neu": "NEUT"}
+
+
+def bucket(vs):
+
+    # which training set a sentence with these scores belongs in
+    if vs["pos"] > 0.500:
+        return "pos"
+    elif vs["neg"] > 0.500 and vs["pos"] < 0.500:
+        return "neg"
+    return "neu"
+
+
+class BucketWriter(object):
+
+    """
+    One corpus.CorpusWriter per training set: sentences are appended to its out.txt (and the
+    files it rotates into), skipping any the set already holds, without rewriting what is there.
+    """
+
+    def __init__(self, out_dir=VOCAL_DIR, max_bytes=None):
+        import corpus
+        kwargs = {} if max_bytes is None else {"max_bytes": max_bytes}
+        self.writers = {label: corpus.CorpusWriter(join(out_dir, name), **kwargs)
+                        for label, name in BUCKETS.items()}
+        self.counts = dict.fromkeys(BUCKETS, 0)
+
+    def write(self, label, sentence):
+        if self.writers[label].append(sentence):
+            self.counts[label] += 1
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# built in the parent before the pool forks, so every worker shares its lexicon copy-on-write
+_pool_analyzer = None
+
+
+def _label_chunk(lines):
+
+    global _pool_analyzer
+    if _pool_analyzer is None:
+        # only without fork, where each worker has to build its own
+        _pool_analyzer = SentimentIntensityAnalyzer()
+    return [(bucket(vs), line) for line, vs in zip(lines, _pool_analyzer.polarity_scores_batch(lines))]
+
+
+def label_corpus(lines, out_dir=VOCAL_DIR, processes=None, chunk_size=2000):
+
+    """
+    Labels every non-empty line and appends it to the matching training set. Lines are streamed
+    through a process pool in chunks, with a bounded number of chunks in flight, so the corpus
+    never has to fit in memory. Returns the number of new lines written to each set; lines a
+    set already holds are skipped.
+    """
+    global _pool_analyzer
+    import multiprocessing
+    from collections import deque
+    if _pool_analyzer is None:
+        _pool_analyzer = SentimentIntensityAnalyzer()
+    _pool_analyzer.lexicon  # loaded before the fork, not once per worker
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing = multiprocessing.get_context("fork")
+    processes = processes or multiprocessing.cpu_count()
+
+    def chunks():
+        chunk = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    with BucketWriter(out_dir) as writer, multiprocessing.Pool(processes) as pool:
+        pending = deque()
+        for chunk in chunks():
+            pending.append(pool.apply_async(_label_chunk, (chunk,)))
+            while len(pending) > 2 * processes or (pending and pending[0].ready()):
+                for label, line in pending.popleft().get():
+                    writer.write(label, line)
+        while pending:
+            for label, line in pending.popleft().get():
+                writer.write(label, line)
+    return writer.counts
+
+
 if __name__ == '__main__':
 
+    import argparse, fileinput, time
+    parser = argparse.ArgumentParser(description="Scores the bundled example sentences and then "
+                                     "labels what the assistant didn't understand, as it comes in over the bus. "
+                                     "Given corpus files, labels those into the VOCAL training sets instead.")
+    parser.add_argument("corpus", nargs="*", help="text files with one sentence per line, - for stdin")
+    parser.add_argument("--out", default=VOCAL_DIR, help="directory holding the POS, NEG and NEUT training sets")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.corpus:
+        t0 = time.time()
+        counts = label_corpus(fileinput.input(args.corpus, openhook=fileinput.hook_encoded("utf-8")),
+                              args.out, args.processes, args.chunk_size)
+        print("Labelled {} lines in {:.1f} s: {}".format(sum(counts.values()), time.time() - t0, counts))
+        raise SystemExit
 
-    def a_pos(x):
-        # if the message is pos put it here
-        with open("/PARAGON/lib/VOCAL/POS/out.txt", "w") as f1:
-            f1.write(x) 
-
-    def neut(x):
-        # If message is neut put it here
-        print(x)
-        with open("testneut.txt") as f:
-            with open("/PARAGON/lib/VOCAL/POS/out.txt", "w") as f1:
-                for line in f:
-                    f1.write(line) 
-    def neg(x):
-        # if its neg, put it here.
-        print(x)
-        with open("testn.txt") as f:
-            with open("/PARAGON/lib/VOCAL/POS/out.txt", "w") as f1:
-                for line in f:
-                    f1.write(line)
-
-    
     sentences = ["VADER is smart, handsome, and funny.",      # positive sentence example
                 "VADER is not smart, handsome, nor funny.",   # negation sentence example
                 "VADER is smart, handsome, and funny!",       # punctuation emphasis handled correctly (sentiment intensity adjusted)
@@ -481,46 +1013,27 @@ if __name__ == '__main__':
                 "Today only kinda sux! But I'll get by, lol",  # mixed sentiment example with slang and constrastive conjunction "but"
                 ]
 
-    with open('test.txt', 'r') as f:
-        a = [line.strip() for line in f]
-        z = a + sentences
-        print(z)
-    newsent = []
-    negsent = []
-    neusent = []
     analyzer = SentimentIntensityAnalyzer()
-    for sentence in z:
-        vs = analyzer.polarity_scores(sentence)
-        if vs["pos"] > 0.500:
-            print(vs["pos"])
-            print("^^pos")
-            x = sentence
-            newsent.append(x)
-            print(newsent)
-            #if the message is pos put it here
-            with open("/PARAGON/lib/VOCAL/POS/out.txt", "w") as f1:
-                final = '\n'.join(newsent)
-                f1.write(final)
-            print("{:-<65} {}".format(sentence, str(vs)))
-        elif vs["neg"] > 0.500 and vs["pos"] < 0.500:
-            print(vs["neg"])
-            print("^^ neg")
-            x = sentence
-            negsent.append(x)
-            print(newsent)
-            #if the message is pos put it here
-            with open("/PARAGON/lib/VOCAL/NEG/out.txt", "w") as f1:
-                final = '\n'.join(negsent)
-                f1.write(final)
-
-        else:
-            print(vs["neu"])
-            print("{:-<65} {}".format(sentence, str(vs)))
-            x = sentence
-            neusent.append(x)
-            print(neusent)
-            #if the message is pos put it here
-            with open("/PARAGON/lib/VOCAL/NEUT/out.txt", "w") as f1:
-                final = '\n'.join(neusent)
-                f1.write(final)
+    writer = BucketWriter(args.out)
 
+    def label(sentence):
+        vs = analyzer.polarity_scores(sentence)
+        sentiment = bucket(vs)
+        print("{:-<65} {}".format(sentence, str(vs)))
+        writer.write(sentiment, sentence)
+        writer.flush()
+        return sentiment, vs
+
+    for sentence in sentences:
+        label(sentence)
+
+    #Then label whatever the assistant couldn't handle, as it comes in over the bus
+    import bus
+    try:
+        client = bus.connect()
+    except OSError:
+        print("The assistant isn't running, no bus at " + bus.SOCKET_PATH)
+        raise SystemExit
+    for topic, sentence in client.subscribe(bus.UTTERANCES):
+        sentiment, vs = label(sentence)
+        client.publish(bus.SENTIMENT, {'text': sentence, 'label': sentiment, 'scores': vs})
@@ -0,0 +1,58 @@
+import os
+import corpus
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_adopts_a_last_line_without_newline(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    _write(out, b'That is great\nToday SUX!')
+    with corpus.CorpusWriter(str(tmp_path)) as writer:
+        assert writer.lines == 2
+        assert not writer.append('Today SUX!')
+        assert writer.append('VADER is smart')
+    assert _read(out) == b'That is great\nToday SUX!\nVADER is smart\n'
+    assert [line for line, _ in corpus.new_lines(str(tmp_path))] == ['That is great', 'Today SUX!', 'VADER is smart']
+
+
+def test_cuts_a_torn_write_after_the_manifest(tmp_path):
+    with corpus.CorpusWriter(str(tmp_path)) as writer:
+        writer.append('first')
+    with open(str(tmp_path / 'out.txt'), 'ab') as f:
+        f.write(b'second\nhalf a sen')
+    with corpus.CorpusWriter(str(tmp_path)) as writer:
+        assert writer.lines == 2
+    assert _read(str(tmp_path / 'out.txt')) == b'first\nsecond\n'
+
+
+def test_adopts_a_segment_the_manifest_lost(tmp_path):
+    with corpus.CorpusWriter(str(tmp_path), max_bytes=5) as writer:
+        writer.extend(['one', 'two'])
+    #a crash after rotating into out.0002.txt, before the manifest listed it
+    _write(str(tmp_path / 'out.0002.txt'), b'three\n')
+    with corpus.CorpusWriter(str(tmp_path), max_bytes=5) as writer:
+        assert not writer.append('three')
+        writer.append('four')
+    names = [entry['name'] for entry in corpus.read_manifest(str(tmp_path))['files']]
+    assert names == ['out.txt', 'out.0001.txt', 'out.0002.txt', 'out.0003.txt']
+    assert [line for line, _ in corpus.new_lines(str(tmp_path))] == ['one', 'two', 'three', 'four']
+
+
+def test_append_new_lines_picks_up_where_it_stopped(tmp_path):
+    directory, train = str(tmp_path / 'NEG'), str(tmp_path / 'train.en')
+    with corpus.CorpusWriter(directory) as writer:
+        writer.extend(['a', 'bb'])
+    assert corpus.append_new_lines(directory, train) == 2
+    assert corpus.append_new_lines(directory, train) == 0
+    with corpus.CorpusWriter(directory) as writer:
+        writer.append('cc')
+    assert corpus.append_new_lines(directory, train) == 1
+    assert _read(train) == b'a\nbb\ncc\n'
@@ -0,0 +1,41 @@
+import intents
+
+
+def test_first_match_follows_priority_then_length():
+    router = intents.IntentRouter()
+    assert router.match('chrome-func what is the time') == 'chrome'
+    assert router.match('what is the time') == 'time'
+    assert router.match('athena weather please') == 'weather'
+    assert router.match('where is what is a') == 'define'  # same priority, longer phrase
+    assert router.match('good evening') == 'evening'
+    assert router.match('nothing to see here') is None
+
+
+def test_exact_intents_need_the_whole_message():
+    router = intents.IntentRouter()
+    assert router.match('athena') == 'athena'
+    assert router.match('athena how are you') is None
+
+
+def test_earlier_intent_wins_a_tie():
+    router = intents.IntentRouter([
+        {'name': 'first', 'priority': 1, 'phrases': ['same words']},
+        {'name': 'second', 'priority': 1, 'phrases': ['same words']},
+    ])
+    assert router.match('say the same words') == 'first'
+
+
+def test_a_phrase_inside_a_longer_one_is_still_found():
+    router = intents.IntentRouter([
+        {'name': 'long', 'priority': 1, 'phrases': ['what is another']},
+        {'name': 'short', 'priority': 5, 'phrases': ['what is a']},
+        {'name': 'overlap', 'priority': 3, 'phrases': ['another day']},
+    ])
+    assert router.match('what is another day') == 'short'
+    assert router.matches('what is another day') == [('short', 9), ('overlap', 11), ('long', 15)]
+
+
+def test_phrases_are_matched_literally():
+    router = intents.IntentRouter([{'name': 'dots', 'phrases': ['a.b (c)']}])
+    assert router.match('x a.b (c) y') == 'dots'
+    assert router.match('x aXb c y') is None
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import listener
+
+RATE = listener.SAMPLE_RATE
+
+
+def _pcm(*parts):
+    # (kind, seconds) pairs of quiet noise and loud tone, as int16 PCM bytes
+    rng = np.random.RandomState(0)
+    audio = []
+    for kind, sec in parts:
+        noise = rng.normal(0, 50, int(RATE * sec))
+        if kind == 'tone':
+            t = np.arange(int(RATE * sec)) / float(RATE)
+            noise = noise + 4000 * np.sin(2 * np.pi * 220 * t)
+        audio.append(noise)
+    return np.concatenate(audio).astype(np.int16).tobytes()
+
+
+def _transcripts(ears):
+    said = []
+    while True:
+        text = ears.listen(timeout=5)
+        if text is None:
+            return said
+        said.append(text)
+
+
+def test_each_utterance_is_transcribed_in_order():
+    pcm = _pcm(('noise', 0.6), ('tone', 0.5), ('noise', 0.8), ('tone', 0.3), ('noise', 0.8),
+               ('tone', 0.7), ('noise', 0.8))
+    recognizer = listener.StubRecognizer(['one', 'two', 'three'], delay=0.05)
+    ears = listener.Listener(recognizer, listener.PcmSource(pcm)).start()
+    assert _transcripts(ears) == ['one', 'two', 'three']
+    assert ears.dropped == 0
+    ears.stop()
+
+
+def test_segments_are_dropped_when_recognition_falls_behind():
+    parts = [('noise', 0.6)] + [('tone', 0.2), ('noise', 0.7)] * 6
+    recognizer = listener.StubRecognizer(['said %d' % i for i in range(6)], delay=0.5)
+    ears = listener.Listener(recognizer, listener.PcmSource(_pcm(*parts)), workers=1, max_pending=1)
+    ears.start()
+    said = _transcripts(ears)
+    assert ears.dropped > 0
+    assert len(said) == 6 - ears.dropped
+    assert said == ['said %d' % i for i in range(len(said))]  # What is kept stays in order
+    ears.stop()
+
+
+def test_a_failing_source_is_raised_from_listen():
+    class _Broken(listener.PcmSource):
+        def read(self):
+            raise IOError('microphone unplugged')
+    ears = listener.Listener(listener.StubRecognizer([]), _Broken(b'')).start()
+    with pytest.raises(IOError):
+        ears.listen(timeout=5)
+    with pytest.raises(IOError):  # And again on later calls, instead of blocking
+        ears.listen(timeout=5)
+    ears.stop()
@@ -0,0 +1,71 @@
+import time
+import cache
+
+
+def _lookups():
+    return cache.LookupCache(path=None, ttls={'web': 3600})
+
+
+def _fetcher(headers):
+    calls = []
+    def fetch():
+        calls.append(len(calls))
+        return cache.Fresh('answer %d' % len(calls), cache.max_age(headers), not cache.no_store(headers))
+    return fetch, calls
+
+
+def _fresh_for(lookups, key):
+    return lookups.memory[('web', key)][1] - time.time()
+
+
+def test_max_age_reads_cache_control():
+    assert cache.max_age({'Cache-Control': 'public, max-age=60'}) == 60
+    assert cache.max_age({'Cache-Control': 'no-cache'}) == 0
+    assert cache.max_age({'Cache-Control': 'private'}) is None
+    assert cache.max_age({}) is None
+    assert cache.max_age(None) is None
+    assert cache.no_store({'Cache-Control': 'no-store'})
+    assert not cache.no_store({'Cache-Control': 'max-age=60'})
+
+
+def test_missing_header_uses_the_source_ttl():
+    lookups = _lookups()
+    fetch, calls = _fetcher({})
+    assert lookups.get('web', 'q', fetch) == 'answer 1'
+    assert 3590 < _fresh_for(lookups, 'q') <= 3600
+    assert lookups.get('web', 'q', fetch) == 'answer 1'
+    assert len(calls) == 1
+
+
+def test_max_age_overrides_the_source_ttl():
+    lookups = _lookups()
+    fetch, calls = _fetcher({'Cache-Control': 'max-age=60'})
+    lookups.get('web', 'q', fetch)
+    assert 50 < _fresh_for(lookups, 'q') <= 60
+
+
+def test_no_cache_is_kept_stale_and_revalidated():
+    lookups = _lookups()
+    fetch, calls = _fetcher({'Cache-Control': 'no-cache'})
+    assert lookups.get('web', 'q', fetch) == 'answer 1'
+    assert _fresh_for(lookups, 'q') <= 0
+    assert lookups.get('web', 'q', fetch) == 'answer 1'  # Served stale, refetched behind it
+    deadline = time.time() + 5
+    while len(calls) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2 and lookups.stats()['stale_hits'] == 1
+
+
+def test_max_age_zero_is_not_kept_longer_than_max_age_sixty():
+    lookups = _lookups()
+    lookups.get('web', 'zero', _fetcher({'Cache-Control': 'max-age=0'})[0])
+    lookups.get('web', 'sixty', _fetcher({'Cache-Control': 'max-age=60'})[0])
+    assert _fresh_for(lookups, 'zero') < _fresh_for(lookups, 'sixty')
+
+
+def test_no_store_is_not_kept():
+    lookups = _lookups()
+    fetch, calls = _fetcher({'Cache-Control': 'no-store'})
+    assert lookups.get('web', 'q', fetch) == 'answer 1'
+    assert lookups.get('web', 'q', fetch) == 'answer 2'
+    assert ('web', 'q') not in lookups.memory
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+import cache
+import lookup
+
+SLOW = 2.0
+
+#What each provider's real endpoint answers, and what it answers when it has nothing
+BODIES = {
+    '/v1/result': (b'42', b''),
+    '/w/api.php': (json.dumps({'batchcomplete': '', 'query': {'pages': {'19331': {
+        'pageid': 19331, 'title': 'Mars', 'extract': 'Mars is the fourth planet from the Sun'}}}}).encode(),
+                   json.dumps({'batchcomplete': ''}).encode()),
+    '/results': (b'<a href="/watch?v=dQw4w9WgXcQ" class="yt-uix-tile-link">Mars</a>', b'<p>No results</p>'),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Paths are /<behaviour>/<provider path>: "slow" answers after SLOW seconds, "empty" has nothing
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        behaviour, _, rest = self.path[1:].partition('/')
+        if behaviour == 'slow':
+            time.sleep(SLOW)
+        answer, nothing = BODIES['/' + rest.split('?')[0]]
+        body = nothing if behaviour == 'empty' else answer
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'max-age=60')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def stub():
+    server = _Server(('127.0.0.1', 0), _Handler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:%d' % server.server_port
+    services = []
+    def service(behaviours, **kwargs):
+        endpoints = {name: '%s/%s' % (base, behaviour) for name, behaviour in behaviours.items()}
+        lookups = lookup.LookupService(endpoints=endpoints, **kwargs)
+        services.append(lookups)
+        return lookups
+    service.requests = server.requests
+    yield service
+    for lookups in services:
+        lookups.close()
+    server.shutdown()
+
+
+def test_providers_parse_their_answers(stub):
+    lookups = stub({'wolfram': 'fast', 'wikipedia': 'fast', 'youtube': 'fast'})
+    assert lookups.wolfram('meaning of life') == '42'
+    assert lookups.wikipedia('mars') == 'Mars is the fourth planet from the Sun.'
+    assert lookups.youtube('mars') == lookups.endpoints['youtube'] + '/watch?v=dQw4w9WgXcQ'
+
+
+def test_first_answer_wins_and_slow_providers_are_cancelled(stub):
+    lookups = stub({'wolfram': 'slow', 'wikipedia': 'fast', 'youtube': 'empty'})
+    t0 = time.time()
+    assert lookups.first('mars', ['wolfram', 'wikipedia', 'youtube']) == (
+        'wikipedia', 'Mars is the fourth planet from the Sun.')
+    assert time.time() - t0 < SLOW / 2
+
+
+def test_providers_past_their_timeout_are_dropped(stub):
+    lookups = stub({'wolfram': 'slow', 'wikipedia': 'empty'}, timeouts={'wolfram': 0.2})
+    t0 = time.time()
+    assert lookups.first('mars', ['wolfram', 'wikipedia']) == (None, None)
+    assert time.time() - t0 < SLOW / 2
+
+
+def test_all_empty_returns_nothing(stub):
+    lookups = stub({'wolfram': 'empty', 'wikipedia': 'empty', 'youtube': 'empty'})
+    assert lookups.first('mars', ['wolfram', 'wikipedia', 'youtube']) == (None, None)
+
+
+def test_answers_are_cached_per_question(stub):
+    lookups = stub({'wolfram': 'fast'}, cache=cache.LookupCache(path=None))
+    assert lookups.first('meaning of life', ['wolfram']) == ('wolfram', '42')
+    assert lookups.first('meaning of life', ['wolfram']) == ('wolfram', '42')
+    assert len(stub.requests) == 1
+    assert lookups.cache.stats()['hits'] == 1
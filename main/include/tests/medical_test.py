@@ -0,0 +1,58 @@
+import os
+import medical
+
+DICTIONARY = '''Abdomen: The part of the body between the chest and the pelvis.
+Abscess: A collection of pus.
+Acne - A disorder of the hair follicles and oil glands.
+
+Anemia
+A condition in which the blood lacks healthy red cells.
+It can make one feel tired and weak.
+
+Aspirin -- A drug that relieves pain and fever.
+'''
+
+
+def _dictionary(tmp_path, text=DICTIONARY):
+    path = str(tmp_path / 'Medical_Dictionary.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def test_exact_terms_in_every_format(tmp_path):
+    terms = medical.MedicalDictionary(_dictionary(tmp_path))
+    assert terms.define('abscess') == 'A collection of pus.'
+    assert terms.define('Acne') == 'A disorder of the hair follicles and oil glands.'
+    assert terms.define('aspirin') == 'A drug that relieves pain and fever.'
+    assert terms.count == 5
+    terms.close()
+
+
+def test_multi_line_entries(tmp_path):
+    terms = medical.MedicalDictionary(_dictionary(tmp_path))
+    assert terms.define('anemia') == ('A condition in which the blood lacks healthy red cells.\n'
+                                      'It can make one feel tired and weak.')
+    terms.close()
+
+
+def test_prefix_falls_back_to_the_first_matching_term(tmp_path):
+    terms = medical.MedicalDictionary(_dictionary(tmp_path))
+    assert terms.define('abd') == 'The part of the body between the chest and the pelvis.'
+    assert terms.define('an') == terms.define('anemia')
+    assert terms.lookup('zebra') == []
+    assert terms.lookup('  ') == []
+    terms.close()
+
+
+def test_a_stale_index_is_rebuilt(tmp_path):
+    path = _dictionary(tmp_path)
+    medical.MedicalDictionary(path).close()
+    index = medical.index_path(path)
+    built = os.stat(index).st_mtime_ns
+    _dictionary(tmp_path, DICTIONARY + 'Zinc: A mineral the body needs in small amounts.\n')
+    os.utime(path, ns=(built + 10 ** 9, built + 10 ** 9))
+    terms = medical.MedicalDictionary(path)
+    assert terms.define('zinc') == 'A mineral the body needs in small amounts.'
+    assert terms.count == 6
+    terms.close()
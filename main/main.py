@@ -82,72 +82,29 @@ class spn():
     def chrome(x):
         message = x
         message = message.replace("chrome-func", "")
-        if ('wolfram') in message:
-         #Que wolfram alpha with questions.
-            message = message.replace("wolfram", "")
-            import wolframalpha
-            client = wolframalpha.Client("929P8L-QQPL5L6XT2") #Need to get a wolfram api
-            res = client.query(message)
-            for pod in res.pods:
-                for sub in pod.subpods:
-                    if enable_s == True:
-                        Speech.say(rand,n,mixer)
-                    else:
-                        print(sub.text)
-
-        if ('google') in message:
-            message = message.replace("google","")
-            message = message.replace(" ", "+")
-            from bs4 import BeautifulSoup
-            import requests
-            page = requests.get("https://www.google.com/search?q=" + message)
-            page
-            soup = BeautifulSoup(page.content, 'html.parser') 
-            resp = soup.find_all('div')[27].get_text()
-            resp = resp.replace("\n","")
-            rand = ["There are" + str(soup.find_all('div')[22].get_text()) + " " + resp]
+        #Wolfram, google, wikipedia and youtube are asked at once; the first one to answer wins.
+        providers = [name for name in ('wolfram', 'google', 'wikipedia', 'youtube') if name in message]
+        if providers:
+            import lookup
+            query = message
+            for name in providers:
+                query = query.replace(name, "")
+            provider, answer = lookup.service().first(query.strip(), providers)
+            if provider == 'youtube':
+                #Open the link in chrome
+                rand = ['Searching for ' + query + 'on youtube.']
+                Chrome = ("google-chrome %s")
+                webbrowser.get(Chrome).open(answer)
+            elif provider is not None:
+                rand = [answer]
+            else:
+                rand = [ERR_W]
             if enable_s == True:
                 Speech.say(rand,n,mixer)
             else:
                 ref_rand = ''.join(str(e) for e in rand)
                 print(ref_rand)
 
-        if ('wikipedia') in message:
-            print(message)
-            import requests
-            message = message.replace("wikipedia", "")
-            message = message.replace(" ", "_")
-            message = message.capitalize()
-            proxies = {
-            }
-            headers = {
-                "User-Agent": "Definitions/1.0"
-            }
-            params = {
-                'action':'query',
-                'prop':'extracts',
-                'format':'json',
-                'exintro':1,
-                'explaintext':1,
-                'generator':'search',
-                'gsrsearch':message,
-                'gsrlimit':1,
-                'continue':''
-            }
-            r = requests.get('http://en.wikipedia.org/w/api.php',
-                            params=params,
-                            headers=headers,
-                            proxies=proxies)
-            json1 = r.json()
-            result = list(json1["query"]["pages"].items())[0][1]["extract"]
-            rand = [(result) + '.']
-            rand = ''.join(str(e) for e in rand)
-            #Chrome = ("google-chrome %s")
-            #webbrowser.get(Chrome)
-            #webbrowser.open('https://en.wikipedia.org/wiki/' + message, new=2, autoraise=True)
-            print(rand) #Speech.say(rand,n,mixer)
-
-
         if ('.com') in message :
             rand = ['Opening' + message]
             Chrome = ("google-chrome %s")
@@ -158,17 +115,6 @@ class spn():
                 ref_rand = ''.join(str(e) for e in rand)
                 print(ref_rand)
 
-        if ('youtube') in message:
-            rand = ['Searching for ' + message + 'on youtube.']
-            import urllib.request, urllib.parse, re
-            #Search youtube and request the link from it.
-            query_string = urllib.parse.urlencode({"search_query" : input()})
-            html_content = urllib.request.urlopen("http://www.youtube.com/results?" + query_string)
-            search_results = re.findall(r'href=\"\/watch\?v=(.{11})', html_content.read().decode())
-            #Open the link in chrome
-            Chrome = ("google-chrome %s")
-            webbrowser.get(Chrome).open("http://www.youtube.com/watch?v=" + search_results[0])
-
         if ('.net') in message :
             rand = ['Opening' + message]
             Chrome = ("google-chrome %s")         
@@ -192,7 +138,8 @@ class spn():
 
         if ('paper') in message:
             name = message.replace("search for papers on", "")
-            embed_prot.search(name)
+            import funcs
+            funcs.search(name)
 
     def main():
         #Start by loading all libraries and files
@@ -201,25 +148,20 @@ class spn():
         "   Importing all modules from system\n" +
         "******************************************")
 
-        try:
-            import requests, pywapi, feedparser, json, os, subprocess, signal, time, datetime, random, Speech, funcs
-            import pyaudio, json, nltk, scipy, math, textblob, webbrowser, keras
-            import speech_recognition as sr
-            from pygame import mixer
-            import yahoo_finance as fc
-            from time import strftime
-            import tensorflow as tf
-            import numpy as np
-            from multiprocessing import Process
-            from keras.applications.resnet50 import ResNet50
-            from keras.preprocessing import image
-            from keras.applications.resnet50 import preprocess_input, decode_predictions
-            import googlemaps as gmaps
-
-            
-        except ImportError:
-            print("It appears as if you do not have all the packages!")
-            #raise SystemExit
+        #Only cheap modules are imported here. Everything heavy goes through the registry and is
+        #imported the first time an intent actually uses it (or by the warm-up thread below).
+        import json, os, queue, subprocess, signal, threading, time, datetime, random, webbrowser, funcs, intents, lazy, cache, definitions, bus
+        modules = lazy.ImportRegistry()
+        requests = modules.lazy('requests')
+        pywapi = modules.lazy('pywapi')
+        feedparser = modules.lazy('feedparser')
+        Speech = modules.lazy('Speech')
+        mixer = modules.lazy('pygame.mixer')
+
+        #Likely to be needed in a typical session, so import them in the background once the prompt is up
+        warm_up = ['requests', 'lookup', 'feedparser', 'pywapi', 'Speech']
+        if enable_s == True:
+            warm_up = ['speech_recognition'] + warm_up
 
         print(requests, pywapi, feedparser, feedparser, json, os, subprocess, signal, time, datetime, random, Speech)
         #The users personal data, which will be edited when running the inst.py
@@ -252,206 +194,226 @@ class spn():
             '''
 
             def Interface():
-                def runtime(message):
-                    try:
+                #Each intent in intents.ASSISTANT_INTENTS is handled by the function of the same name below.
+                #The router picks the single best intent for a message, instead of every matching
+                #branch of an if/if/if chain running.
+                router = intents.IntentRouter()
 
-                        #Que wikipedia using a bot and some clever json manipulations, gets the entire article
-                        #TODO: Find ways to speak only certain portions of the article, or summarize it, find that in nltk.
-                        if ("chrome-func") in message:
-                            x = message
-                            x.replace("chrome-func", "")
-                            spn.chrome(x)
-                        
-                        #Just some nice etiquit
-                        if ('goodbye') in message:
-
-                            rand = ['Goodbye ' + (datafile["Identity"][0]["pronouns"]), 'athena powering off']
-                            Speech.say(rand,n,mixer)
-
-                        if ('evening') in message:
-
-                            rand = ['Good evening ' + (datafile["Identity"][0]["pronouns"])]
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-                        if ('morning') in message:
-
-                            mTime = time.strftime('%B:%d:%Y')
-                            rand = ['Good morning ' + (datafile["Identity"][0]["pronouns"]) + ', I grabbed the news for,' + mTime]
-                            Chrome = ("google-chrome %s")
-
-                            webbrowser.get(Chrome)
-                            webbrowser.open('https://www.sciencenews.org/topic/math-technology', new=2, autoraise=True)
-
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-
-                        if message == ('athena'):
-
-                            rand = ['Yes Sir?', 'What can I, do for you ' + (datafile["Identity"][0]["pronouns"])]
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-
-                        #Handle ques on the internet connection
-                        #if ('on') and ('display') and ('power') in message:
-                            #find a way to make ipv4 addresses all static, so I don't have to make a script to constantly 'brute force' the network for ipv4 addresses and specifically state they are mine
-                            
-                        if ('are we connected') in message:
+                def chrome(message):
+                    #Que wikipedia using a bot and some clever json manipulations, gets the entire article
+                    #TODO: Find ways to speak only certain portions of the article, or summarize it, find that in nltk.
+                    x = message
+                    x = x.replace("chrome-func", "")
+                    spn.chrome(x)
 
-                            REMOTE_SERVER = "www.google.com"
-                            Speech.wifi()
-                            rand = ['We are connected']
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
+                #Just some nice etiquit
+                def goodbye(message):
 
-                        
+                    rand = ['Goodbye ' + (datafile["Identity"][0]["pronouns"]), 'athena powering off']
+                    Speech.say(rand,n,mixer)
 
-                        if ('what is the time') in message or ('what time is it') in message or ('can you get me the current time') in message or ('can you tell me the time') in message:
+                def evening(message):
 
-                            lTime = time.strftime('%I:%M')
-                            rand = ['the time is,' + lTime + ',sir.']
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
+                    rand = ['Good evening ' + (datafile["Identity"][0]["pronouns"])]
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
 
-                        if ('what day is it') in message or ('what is the date') in message or ('date please') in message:
-                            
-                            tDate = time.strftime('%B:%d:%Y')
-                            rand = ['Today is,' + tDate + (datafile["Identity"][0]["pronouns"])]
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-
-                        if ('athena can you get me the weather') in message or ('can you get the weather') in message or ('athena weather please') in message or ('weather please') in message:
-                           
-                            noaa_result = pywapi.get_weather_from_noaa('KPWT')
-                            rand = ["I've fetched the weather for you." + "It is currently" + noaa_result['weather'] + '\n' + 'Current Temperature is: ' + noaa_result['temp_f'] +  'Degrees.'+ '\n' + 'Information grabbed from' + noaa_result['location']]
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-                        
-                        if ('can you get the news') in message or ('get the news please') in message or ('athena get the news please') in message:
-                           
-                            rand = ['Fetching todays headlines, sir, please wait.']
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-                            time.sleep(5)
-
-                            d = feedparser.parse('http://rss.nytimes.com/services/xml/rss/nyt/Science.xml')
-                            rand = [d.feed['title'] + d.feed['description']]
-                            Speech.say(rand,n,mixer)
-
-                        if ('where is') in message:
-
-                            rand = ['Searching for' + message + ', please wait.']
-                            LocSrch_Message = message.replace("where is", "")
-                            Chrome = ("google-chrome %s")
-                            webbrowser.get(Chrome).open('http://www.'+ message)
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-
-                        if ('what is a') in message or ("what is an") in message:
-                            from nltk.corpus import wordnet as Word
-
-                            if "an" in message:
-
-                                message = message.replace("an ","")
-
-                            if "a" in message:
-                                message = message.replace("a ","")
-
-                            spoken_def = Word.synset(message + '.n.1')
-                            colist = str(len(spoken_def))
-                            rand = ['Sir, there are ' + colist + 'entries, reading the first one: ' + spoken_def]
-
-                            webbrowser.get(Chrome)
-                            webbrowser.open("http://www.dictionary.com/browse/" + message)
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
-
-                        if ('medical') in message:
-                            #Searches the entire medical dictionary for a term of definition
-
-                            term = message.replace("medical","")
-                            import nltk.corpus
-                            medical = open('./athena/Data/Databases/Medical_Dictionary.txt')
-
-                            #Converts the text file into an actual corpus, the reason it isn't converted or loaded above,
-                            #is because it would consume to many resources if it were constantly loaded.
-                            text = medical.read()
-                            text1 = text.split()
-                            conc_term = nltk.corpus.nltk.Text(text1)
-                            med_term = conc_term.concordance(term)
-                            rand = [med_term]
-                            if enable_s == True:
-                                Speech.say(rand,n,mixer)
-                            else:
-                                ref_rand = ''.join(str(e) for e in rand)
-                                print(ref_rand)
+                def morning(message):
 
+                    mTime = time.strftime('%B:%d:%Y')
+                    rand = ['Good morning ' + (datafile["Identity"][0]["pronouns"]) + ', I grabbed the news for,' + mTime]
+                    Chrome = ("google-chrome %s")
 
+                    webbrowser.get(Chrome)
+                    webbrowser.open('https://www.sciencenews.org/topic/math-technology', new=2, autoraise=True)
 
-                        
-                            
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def athena(message):
+
+                    rand = ['Yes Sir?', 'What can I, do for you ' + (datafile["Identity"][0]["pronouns"])]
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                #Handle ques on the internet connection
+                #if ('on') and ('display') and ('power') in message:
+                    #find a way to make ipv4 addresses all static, so I don't have to make a script to constantly 'brute force' the network for ipv4 addresses and specifically state they are mine
+
+                def connected(message):
+
+                    REMOTE_SERVER = "www.google.com"
+                    Speech.wifi()
+                    rand = ['We are connected']
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def time_of_day(message):
+
+                    lTime = time.strftime('%I:%M')
+                    rand = ['the time is,' + lTime + ',sir.']
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def date(message):
+
+                    tDate = time.strftime('%B:%d:%Y')
+                    rand = ['Today is,' + tDate + (datafile["Identity"][0]["pronouns"])]
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def weather(message):
+
+                    noaa_result = cache.weather('KPWT')
+                    rand = ["I've fetched the weather for you." + "It is currently" + noaa_result['weather'] + '\n' + 'Current Temperature is: ' + noaa_result['temp_f'] +  'Degrees.'+ '\n' + 'Information grabbed from' + noaa_result['location']]
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def news(message):
+
+                    rand = ['Fetching todays headlines, sir, please wait.']
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                    d = cache.feed('http://rss.nytimes.com/services/xml/rss/nyt/Science.xml')
+                    rand = [d['title'] + d['description']]
+                    Speech.say(rand,n,mixer)
+
+                def where(message):
+
+                    rand = ['Searching for' + message + ', please wait.']
+                    LocSrch_Message = message.replace("where is", "")
+                    Chrome = ("google-chrome %s")
+                    webbrowser.get(Chrome).open('http://www.'+ message)
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def define(message):
+                    #WordNet is already loading in the background (see warm_ups below)
+                    word = definitions.subject(message)
+                    senses = definitions.service().define(word)
+                    if senses:
+                        rand = ['Sir, there are ' + str(len(senses)) + ' entries for ' + word + ', reading the first one: ' + senses[0][2]]
+                    else:
+                        rand = ['I could not find a definition for ' + word]
+
+                    Chrome = ("google-chrome %s")
+                    webbrowser.get(Chrome).open("http://www.dictionary.com/browse/" + word)
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                def medical(message):
+                    #Looks the term up in the indexed medical dictionary (see include/medical.py)
+                    term = message.replace("medical","")
+                    import medical
+                    med_term = medical.dictionary().define(term)
+                    rand = [med_term if med_term is not None else 'I could not find ' + term + ' in the medical dictionary.']
+                    if enable_s == True:
+                        Speech.say(rand,n,mixer)
+                    else:
+                        ref_rand = ''.join(str(e) for e in rand)
+                        print(ref_rand)
+
+                handlers = {
+                    'chrome': chrome, 'goodbye': goodbye, 'evening': evening, 'morning': morning,
+                    'athena': athena, 'connected': connected, 'time': time_of_day, 'date': date,
+                    'weather': weather, 'news': news, 'where': where, 'define': define, 'medical': medical,
+                }
+
+                #Anything an intent needs loaded before its first message, started in the background
+                #once the prompt is up so the first query is as fast as later ones
+                warm_ups = {
+                    'define': definitions.service().start,
+                }
+
+                def runtime(message):
+                    try:
+                        intent = router.match(message)
+                        if intent is not None:
+                            handlers[intent](message)
                         else:
 
-                            temporal_save1 = open("./include/test.txt", "r+") #temp1 -> train.en
-                            temporal_save1.write(message)
-                            temporal_save1.close()
+                            #sent.py picks unhandled messages up from the bus and labels them
+                            try:
+                                messages.publish(bus.UTTERANCES, message, timeout=1.0)
+                            except queue.Full:
+                                print("[System] Sentiment labeller is falling behind, message dropped")
                             print(null_error)
 
                     #exceptions
                     except (KeyboardInterrupt,SystemExit):
                         print("Goodbye, athena powering down now")
                         #temp_train()
-                    except sr.UnknownValueError:
-                        print("error")
-                    except sr.RequestError as e:
-                        print("Error, no internet found.")
 
 
+                #Share the message bus with the face recognizer and sentiment labeller
+                messages = bus.default()
+                bus.serve()
+
+                def identity(person):
+                    datafile["Identity"][0].update(person)
+                messages.on(bus.IDENTITY, identity)
+
+                #The import times are printed once the warm-up thread has been through them all
+                modules.warm_up(warm_up, done=lambda: print(modules.report()))
+                for intent in warm_ups:
+                    warm_ups[intent]()
+                if enable_s == True:
+                    #Load tacotron in the background too, every reply after this is a single session.run
+                    #(through a lambda, so Speech is first touched, and imported, on that thread)
+                    threading.Thread(target=lambda: Speech.start(), daemon=True).start()
+
                 doss = os.getcwd()
                 i=0
                 n=0
 
+                if enable_s == True:
+                    #One microphone stream for the whole session; utterances are recognized on
+                    #worker threads while the next one is being captured
+                    import listener
+                    ears = listener.Listener(listener.GoogleRecognizer()).start()
+
                 while (i<1):
                     if enable_s == True:
-                        r = sr.Recognizer()
-                        with sr.Microphone() as source:
-                            audio = r.adjust_for_ambient_noise(source)
-                            n = (n+1)
-                            audio = r.listen(source)
-                            #funcs.detect()
-                            s = (r.recognize_google(audio))
-                            print(s)
-                            message = (s.lower())
-                            runtime(message)
+                        s = ears.listen()
+                        if s is None: #without a timeout, only once the microphone stream has ended
+                            ears.stop()
+                            break
+                        n = (n+1)
+                        #funcs.detect()
+                        print(s)
+                        message = (s.lower())
+                        runtime(message)
                     else:
                         #funcs.detect()
                         s = input(">>>") 